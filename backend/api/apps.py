@@ -6,3 +6,6 @@ class ApiConfig(AppConfig):
     name = 'api'
     verbose_name = 'АПИ'
     verbose_name_plural = 'АПИ'
+
+    def ready(self):
+        import api.signals  # noqa: F401
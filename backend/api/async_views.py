@@ -0,0 +1,78 @@
+"""Асинхронные обёртки представлений для запуска под ASGI.
+
+В Django 3.2 нет асинхронного ORM, поэтому представление DRF целиком
+выполняется в пуле потоков (thread_sensitive=False): медленный запрос
+занимает поток пула, а не весь воркер. Включается ASYNC_API_VIEWS.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import Http404, HttpResponsePermanentRedirect
+from django.urls import URLPattern
+
+from api.connections import check_connections
+from api.middleware import current_query_stats, track_queries
+from api.shortlinks import decode_recipe_id, resolve_short_link
+
+ASYNC_ROUTES = (
+    'tags-list',
+    'tags-detail',
+    'ingredients-list',
+    'ingredients-detail',
+    'recipes-list',
+    'recipes-detail',
+)
+
+
+def run_in_thread(func):
+    """Синхронная функция с обработкой соединений БД, как у запроса WSGI."""
+    def run(*args, **kwargs):
+        close_old_connections()
+        check_connections()
+        try:
+            with track_queries(current_query_stats.get()):
+                response = func(*args, **kwargs)
+                render = getattr(response, 'render', None)
+                if render is not None and not response.is_rendered:
+                    render()
+                return response
+        finally:
+            close_old_connections()
+    return sync_to_async(run, thread_sensitive=False)
+
+
+def async_view(view):
+    """Асинхронная версия синхронного представления."""
+    run = run_in_thread(view)
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        return await run(request, *args, **kwargs)
+    return wrapper
+
+
+def async_routes(urlpatterns, names=ASYNC_ROUTES):
+    """Маршруты роутера DRF, в которых представления names асинхронные."""
+    return [
+        URLPattern(
+            pattern.pattern,
+            async_view(pattern.callback),
+            pattern.default_args,
+            pattern.name
+        )
+        if isinstance(pattern, URLPattern) and pattern.name in names
+        else pattern
+        for pattern in urlpatterns
+    ]
+
+
+async def short_link_redirect(request, code):
+    """Переход по короткой ссылке; коды рецептов — без потоков и БД."""
+    if decode_recipe_id(code) is not None:
+        url = resolve_short_link(code)
+    else:
+        url = await run_in_thread(resolve_short_link)(code)
+    if url is None:
+        raise Http404('Ссылка не найдена')
+    return HttpResponsePermanentRedirect(url)
@@ -0,0 +1,105 @@
+from hashlib import sha256
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from api.cache import is_shared_cache
+
+TOKEN_KEY = 'auth:token:{}'
+USER_KEY = 'auth:user:{}'
+USER_CACHE_FIELDS = (
+    'id',
+    'email',
+    'username',
+    'first_name',
+    'last_name',
+    'avatar',
+    'role',
+    'is_active',
+    'is_staff',
+    'is_superuser',
+)
+
+
+def token_cache_key(key):
+    """Ключ кэша токена; сам токен в кэш не попадает."""
+    return TOKEN_KEY.format(sha256(key.encode()).hexdigest())
+
+
+def invalidate_token(key):
+    cache.delete(token_cache_key(key))
+
+
+def invalidate_user(user_id):
+    cache.delete(USER_KEY.format(user_id))
+
+
+def dump_user(user):
+    """Минимальный набор полей пользователя для кэша, без пароля."""
+    return {
+        field: getattr(user, field) if field != 'avatar' else user.avatar.name
+        for field in USER_CACHE_FIELDS
+    }
+
+
+def load_user(payload):
+    """
+    Пользователь из кэша.
+
+    Остальные поля отложены, как после only(), и дочитываются из базы
+    при обращении; save() обновляет только загруженные поля.
+    """
+    field_names = [
+        field.attname
+        for field in get_user_model()._meta.concrete_fields
+        if field.attname in payload
+    ]
+    return get_user_model().from_db(
+        DEFAULT_DB_ALIAS,
+        field_names,
+        [payload[field] for field in field_names]
+    )
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication с кэшированием токена и пользователя.
+
+    Работает только с общим для воркеров кэшем (Redis, Memcached):
+    с локальным кэшем сброс дошёл бы лишь до одного процесса, поэтому
+    тогда проверка идёт в базу, как у TokenAuthentication.
+    Записи живут AUTH_TOKEN_CACHE_TIMEOUT секунд и сбрасываются
+    сигналами при удалении токена (выход) и сохранении пользователя
+    (смена пароля, блокировка).
+    """
+
+    def authenticate_credentials(self, key):
+        if not is_shared_cache():
+            return super().authenticate_credentials(key)
+        token_key = token_cache_key(key)
+        user_id = cache.get(token_key)
+        payload = (
+            cache.get(USER_KEY.format(user_id))
+            if user_id is not None else None
+        )
+        if payload is None:
+            user, token = super().authenticate_credentials(key)
+            cache.set_many(
+                {
+                    token_key: user.pk,
+                    USER_KEY.format(user.pk): dump_user(user)
+                },
+                settings.AUTH_TOKEN_CACHE_TIMEOUT
+            )
+            return user, token
+        if not payload['is_active']:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+        user = load_user(payload)
+        return user, self.get_model()(key=key, user=user)
@@ -0,0 +1,76 @@
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import urlencode
+
+VERSION_KEY = 'version:{}'
+STATS_KEY = 'stats:{}:{}'
+RECIPE_LIST_KEY = 'recipes:list:{}:{}'
+RECIPE_LIST_STATS = ('hits', 'misses', 'invalidations')
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def is_shared_cache():
+    """Кэш общий для всех процессов, а не локальный для воркера."""
+    return settings.CACHES['default']['BACKEND'] not in LOCAL_CACHE_BACKENDS
+
+
+def get_version(namespace):
+    """Текущая версия данных namespace."""
+    key = VERSION_KEY.format(namespace)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, 1, timeout=None)
+        version = cache.get(key, 1)
+    return version
+
+
+def bump_version(namespace):
+    """Новая версия данных namespace: старые ключи больше не читаются."""
+    key = VERSION_KEY.format(namespace)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, 2, timeout=None)
+        return cache.get(key, 2)
+
+
+def incr_stat(namespace, name):
+    key = STATS_KEY.format(namespace, name)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, timeout=None)
+
+
+def get_stats(namespace, names):
+    keys = {name: STATS_KEY.format(namespace, name) for name in names}
+    values = cache.get_many(keys.values())
+    return {name: values.get(key, 0) for name, key in keys.items()}
+
+
+def recipe_list_cache_key(request):
+    """Ключ кэша страницы списка рецептов.
+
+    Строится из нормализованной строки запроса, хоста (в ответе есть
+    абсолютные ссылки пагинации) и версии данных рецептов.
+    """
+    query = urlencode(sorted(
+        (key, sorted(values))
+        for key, values in request.query_params.lists()
+    ), doseq=True)
+    digest = md5(f'{request.get_host()}?{query}'.encode()).hexdigest()
+    return RECIPE_LIST_KEY.format(get_version('recipes'), digest)
+
+
+def get_recipe_list_stats():
+    stats = get_stats('recipes', RECIPE_LIST_STATS)
+    requests = stats['hits'] + stats['misses']
+    stats['hit_rate'] = stats['hits'] / requests if requests else 0
+    stats['version'] = get_version('recipes')
+    stats['timeout'] = settings.RECIPE_LIST_CACHE_TIMEOUT
+    return stats
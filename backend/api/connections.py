@@ -0,0 +1,59 @@
+import os
+from collections import Counter
+from threading import Lock
+from time import monotonic
+
+from django.conf import settings
+from django.db import connections
+
+CONNECTION_STATS = ('opened', 'reused', 'checked', 'unusable')
+
+_stats = Counter()
+_lock = Lock()
+
+
+def incr_connection_stat(name):
+    with _lock:
+        _stats[name] += 1
+
+
+def get_connection_stats():
+    """Счётчики соединений с БД текущего процесса (воркера)."""
+    with _lock:
+        stats = {name: _stats[name] for name in CONNECTION_STATS}
+    stats['pid'] = os.getpid()
+    stats['conn_max_age'] = settings.CONN_MAX_AGE
+    stats['health_checks'] = settings.CONN_HEALTH_CHECKS
+    stats['health_check_interval'] = settings.CONN_HEALTH_CHECK_INTERVAL
+    return stats
+
+
+def mark_connection_checked(connection):
+    """Соединение только что открыто или проверено."""
+    connection.health_checked_at = monotonic()
+
+
+def check_connections(**kwargs):
+    """
+    Учёт переиспользуемых соединений в начале запроса.
+
+    Вызывается после close_old_connections. При CONN_HEALTH_CHECKS
+    открытое соединение, которое не проверялось дольше
+    CONN_HEALTH_CHECK_INTERVAL секунд, проверяется и закрывается,
+    если БД его уже не принимает: следующий запрос к БД откроет новое.
+    Часто используемые соединения не проверяются на каждом запросе.
+    """
+    for connection in connections.all():
+        if connection.connection is None:
+            continue
+        if settings.CONN_HEALTH_CHECKS and (
+            monotonic() - getattr(connection, 'health_checked_at', 0)
+            >= settings.CONN_HEALTH_CHECK_INTERVAL
+        ):
+            incr_connection_stat('checked')
+            if not connection.is_usable():
+                connection.close()
+                incr_connection_stat('unusable')
+                continue
+            mark_connection_checked(connection)
+        incr_connection_stat('reused')
@@ -0,0 +1,50 @@
+import csv
+import json
+
+
+class Echo:
+    """Псевдо-буфер для csv.writer: возвращает записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def shopping_cart_txt(ingredients):
+    for ingredient in ingredients:
+        yield (
+            f'{ingredient["ingredient__name"]}: '
+            f'{ingredient["sum"]} '
+            f'({ingredient["ingredient__measurement_unit"]})\n'
+        )
+
+
+def shopping_cart_csv(ingredients):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'measurement_unit', 'amount'))
+    for ingredient in ingredients:
+        yield writer.writerow((
+            ingredient['ingredient__name'],
+            ingredient['ingredient__measurement_unit'],
+            ingredient['sum']
+        ))
+
+
+def shopping_cart_json(ingredients):
+    yield '['
+    for index, ingredient in enumerate(ingredients):
+        yield (',' if index else '') + json.dumps(
+            {
+                'name': ingredient['ingredient__name'],
+                'measurement_unit': ingredient['ingredient__measurement_unit'],
+                'amount': ingredient['sum']
+            },
+            ensure_ascii=False
+        )
+    yield ']'
+
+
+SHOPPING_CART_EXPORTERS = {
+    'txt': shopping_cart_txt,
+    'csv': shopping_cart_csv,
+    'json': shopping_cart_json,
+}
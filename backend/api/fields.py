@@ -1,18 +1,88 @@
 import base64
+import binascii
 
 from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import UploadedFile
+from PIL import ImageFile
 from rest_framework import fields
 
+from core.constants_api import (
+    IMAGE_HEADER_SIZE,
+    MAX_IMAGE_DIMENSION,
+    MAX_IMAGE_SIZE
+)
+from core.images import rendition_url
+
+
+def get_image_size(header):
+    """Размеры изображения по его заголовку, без полного декодирования."""
+    parser = ImageFile.Parser()
+    try:
+        parser.feed(header)
+    except (OSError, SyntaxError, ValueError):
+        return None
+    if parser.image is None:
+        return None
+    return parser.image.size
+
 
 class Base64ImageField(fields.ImageField):
-    """Поле кодирования изображения в base64."""
+    """Поле кодирования изображения в base64.
+
+    Принимает также файл из multipart/form-data. Размер и разрешение
+    проверяются до полного декодирования изображения.
+    """
+
+    default_error_messages = {
+        'max_size': 'Размер изображения не должен превышать {max_size} байт.',
+        'max_dimension': (
+            'Стороны изображения не должны превышать {max_dimension} px.'
+        ),
+    }
+
+    def check_limits(self, size, header):
+        if size > MAX_IMAGE_SIZE:
+            self.fail('max_size', max_size=MAX_IMAGE_SIZE)
+        dimensions = get_image_size(header)
+        if dimensions and max(dimensions) > MAX_IMAGE_DIMENSION:
+            self.fail('max_dimension', max_dimension=MAX_IMAGE_DIMENSION)
 
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
+            try:
+                format, imgstr = data.split(';base64,')
+                self.check_limits(
+                    len(imgstr) * 3 // 4,
+                    base64.b64decode(imgstr[:IMAGE_HEADER_SIZE // 3 * 4])
+                )
+                decoded = base64.b64decode(imgstr)
+            except (binascii.Error, ValueError):
+                self.fail('invalid_image')
             ext = format.split('/')[-1]
             data = ContentFile(
-                base64.b64decode(imgstr),
+                decoded,
                 name='photo.' + ext
             )
+        elif isinstance(data, UploadedFile):
+            header = data.read(IMAGE_HEADER_SIZE)
+            data.seek(0)
+            self.check_limits(data.size, header)
         return super().to_internal_value(data)
+
+
+class ImageRenditionField(fields.Field):
+    """Поле URL уменьшенной копии изображения."""
+
+    def __init__(self, rendition, **kwargs):
+        self.rendition = rendition
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        url = rendition_url(value, self.rendition)
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
@@ -1,7 +1,15 @@
+from django.db.models import Exists, OuterRef
 from django_filters.filters import CharFilter, ModelMultipleChoiceFilter
 from django_filters.rest_framework import FilterSet, filters
+from rest_framework.exceptions import ValidationError
 
+from core.constants_api import (
+    CURSOR_QUERY_PARAM,
+    TAGS_MODE_ALL,
+    TAGS_MODE_ANY
+)
 from recipes.models import Ingredient, Recipe, Tag
+from recipes.search import search_recipes
 
 
 class IngredientFilter(FilterSet):
@@ -19,33 +27,79 @@ class RecipeFilter(FilterSet):
 
     author = CharFilter(field_name='author')
     tags = ModelMultipleChoiceFilter(
-        field_name='tags__slug',
         queryset=Tag.objects.all(),
         to_field_name='slug',
-        conjoined=False
+        method='tags_filter'
+    )
+    tags_mode = filters.ChoiceFilter(
+        choices=(
+            (TAGS_MODE_ANY, 'Любой из тегов'),
+            (TAGS_MODE_ALL, 'Все теги'),
+        ),
+        method='tags_mode_filter'
     )
     is_favorited = filters.BooleanFilter(method='is_favorited_filter')
     is_in_shopping_cart = filters.BooleanFilter(
         method='is_in_shopping_cart_filter'
     )
+    search = filters.CharFilter(method='search_filter')
 
     class Meta:
         model = Recipe
         fields = (
             'tags',
+            'tags_mode',
             'author',
             'is_favorited',
-            'is_in_shopping_cart'
+            'is_in_shopping_cart',
+            'search'
+        )
+
+    def tags_filter(self, queryset, name, value):
+        """Фильтр по тегам через EXISTS, без JOIN и дублей рецептов."""
+        if not value:
+            return queryset
+        recipe_tags = Recipe.tags.through.objects.filter(
+            recipe_id=OuterRef('pk')
+        )
+        tag_ids = {tag.id for tag in value}
+        if self.form.cleaned_data.get('tags_mode') == TAGS_MODE_ALL:
+            for tag_id in tag_ids:
+                queryset = queryset.filter(
+                    Exists(recipe_tags.filter(tag_id=tag_id))
+                )
+            return queryset
+        return queryset.filter(
+            Exists(recipe_tags.filter(tag_id__in=tag_ids))
         )
 
+    def tags_mode_filter(self, queryset, name, value):
+        """Режим учитывается в tags_filter."""
+        return queryset
+
     def is_favorited_filter(self, queryset, name, value):
         user = self.request.user
         if value and not user.is_anonymous:
-            return queryset.filter(favorites__user=user)
+            return queryset.filter(is_favorited=True)
         return queryset
 
     def is_in_shopping_cart_filter(self, queryset, name, value):
         user = self.request.user
         if value and not user.is_anonymous:
-            return queryset.filter(shopping_cart__user=user)
+            return queryset.filter(is_in_shopping_cart=True)
         return queryset
+
+    def search_filter(self, queryset, name, value):
+        """Поиск с сортировкой по релевантности.
+
+        Курсорная пагинация сортирует по дате и потеряла бы порядок
+        релевантности, поэтому вместе с поиском она не допускается.
+        """
+        value = value.strip()
+        if not value:
+            return queryset
+        if CURSOR_QUERY_PARAM in self.request.query_params:
+            raise ValidationError(
+                {name: 'Поиск не поддерживает параметр cursor.'}
+            )
+        return search_recipes(queryset, value)
@@ -0,0 +1,100 @@
+from bisect import bisect_left
+from threading import Lock
+from time import monotonic
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+from recipes.models import Ingredient
+
+
+class IngredientIndex:
+    """Индекс ингредиентов в памяти процесса для поиска по началу названия.
+
+    Загружается из БД при первом обращении: отсортированный список
+    названий в casefold и параллельный список готовых к выдаче записей.
+    Поиск - бинарный (bisect), без обращения к БД.
+    Сбрасывается сигналами при изменении ингредиентов в этом процессе;
+    изменения из других процессов (импорт, другие воркеры) видны
+    не позже чем через INGREDIENT_INDEX_TTL секунд: тогда число строк
+    и последнее updated_at сверяются с БД, и при расхождении индекс
+    перестраивается.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._data = None
+        self._state = None
+        self._checked_at = 0
+
+    @staticmethod
+    def get_state():
+        return tuple(Ingredient.objects.aggregate(
+            count=Count('id'),
+            updated_at=Max('updated_at')
+        ).values())
+
+    def is_stale(self):
+        return monotonic() - self._checked_at > settings.INGREDIENT_INDEX_TTL
+
+    def load(self):
+        with self._lock:
+            if self._data is None or self.is_stale():
+                state = self.get_state()
+                if state != self._state:
+                    self._data = None
+                    self._state = state
+                self._checked_at = monotonic()
+            if self._data is None:
+                entries = sorted(
+                    (name.casefold(), name, pk, measurement_unit)
+                    for pk, name, measurement_unit
+                    in Ingredient.objects.values_list(
+                        'id',
+                        'name',
+                        'measurement_unit'
+                    ).iterator()
+                )
+                self._data = (
+                    [entry[0] for entry in entries],
+                    [
+                        {
+                            'id': pk,
+                            'name': name,
+                            'measurement_unit': measurement_unit
+                        }
+                        for _, name, pk, measurement_unit in entries
+                    ]
+                )
+            return self._data
+
+    def get_current_state(self):
+        """Состояние таблицы, по которому построен индекс (для ETag)."""
+        if self._data is None or self.is_stale():
+            self.load()
+        return self._state
+
+    def invalidate(self):
+        with self._lock:
+            self._data = None
+            self._state = None
+
+    def search(self, prefix, limit=None):
+        """Ингредиенты, название которых начинается с prefix."""
+        if limit is None:
+            limit = settings.INGREDIENT_SEARCH_LIMIT
+        data = self._data
+        if data is None or self.is_stale():
+            data = self.load()
+        keys, items = data
+        prefix = prefix.casefold()
+        start = bisect_left(keys, prefix)
+        results = []
+        for index in range(start, min(start + limit, len(keys))):
+            if not keys[index].startswith(prefix):
+                break
+            results.append(items[index])
+        return results
+
+
+ingredient_index = IngredientIndex()
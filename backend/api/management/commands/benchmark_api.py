@@ -0,0 +1,334 @@
+import json
+import math
+import random
+import time
+from secrets import token_hex
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils.text import compress_string
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+
+from api.cache import bump_version
+from api.ingredient_index import ingredient_index
+from api.middleware import brotli
+from api.renderers import FastJSONRenderer
+from core.constants_api import BROTLI_QUALITY
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    Tag
+)
+from recipes.search import rebuild_search_index
+from recipes.services import recount_counters, rebuild_shopping_cart_totals
+from users.models import Subscription
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+TAGS_COUNT = 5
+
+
+def percentile(values, share):
+    """Значение перцентиля share (0..1) по методу ближайшего ранга."""
+    values = sorted(values)
+    return values[max(math.ceil(share * len(values)) - 1, 0)]
+
+
+def random_pairs(first_ids, second_ids, count, exclude_same=False):
+    """count уникальных случайных пар идентификаторов."""
+    pairs = set()
+    limit = len(first_ids) * len(second_ids)
+    count = min(count, limit - (len(first_ids) if exclude_same else 0))
+    while len(pairs) < count:
+        pair = (random.choice(first_ids), random.choice(second_ids))
+        if not (exclude_same and pair[0] == pair[1]):
+            pairs.add(pair)
+    return pairs
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполнение БД синтетическими данными и замер основных '
+        'эндпоинтов API. Данные по умолчанию откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        for name, default, help_text in (
+            ('users', 100, 'Количество пользователей.'),
+            ('recipes', 1000, 'Количество рецептов.'),
+            ('ingredients', 500, 'Количество ингредиентов.'),
+            ('ingredients-per-recipe', 8, 'Ингредиентов в рецепте.'),
+            ('favorites', 5000, 'Количество записей в избранном.'),
+            ('carts', 2000, 'Количество записей в списках покупок.'),
+            ('subscriptions', 1000, 'Количество подписок.'),
+            ('repeat', 20, 'Повторов запроса к каждому эндпоинту.'),
+        ):
+            parser.add_argument(
+                f'--{name}', type=int, default=default, help=help_text
+            )
+        parser.add_argument(
+            '--seed', type=int, help='Seed генератора случайных чисел.'
+        )
+        parser.add_argument(
+            '--output', help='Файл для JSON-отчёта, по умолчанию stdout.'
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Не откатывать созданные данные.'
+        )
+
+    def handle(self, *args, **options):
+        if min(options['users'], options['recipes'],
+               options['ingredients'], options['repeat']) < 1:
+            raise CommandError(
+                'Количество пользователей, рецептов, ингредиентов '
+                'и повторов должно быть больше нуля.'
+            )
+        random.seed(options['seed'])
+        try:
+            with transaction.atomic():
+                started = time.perf_counter()
+                data = self.seed(options)
+                seed_time = time.perf_counter() - started
+                with override_settings(
+                    ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']
+                ):
+                    endpoints = self.run_benchmarks(data, options['repeat'])
+                    encoding = self.benchmark_encoding(
+                        data, options['repeat']
+                    )
+                transaction.set_rollback(not options['keep'])
+        finally:
+            self.reset_caches()
+        report = {
+            'database': connection.vendor,
+            'params': {
+                key: options[key.replace('-', '_')]
+                for key in (
+                    'users', 'recipes', 'ingredients',
+                    'ingredients-per-recipe', 'favorites', 'carts',
+                    'subscriptions', 'repeat', 'seed'
+                )
+            },
+            'seed_seconds': round(seed_time, 3),
+            'endpoints': endpoints,
+            'recipes_list_encoding': encoding,
+        }
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
+
+    def reset_caches(self):
+        """Сброс кешей, которые не видят bulk-вставок и отката."""
+        ingredient_index.invalidate()
+        bump_version('recipes')
+
+    def bulk_ids(self, model, objects, **lookup):
+        model.objects.bulk_create(objects, batch_size=BATCH_SIZE)
+        return list(
+            model.objects.filter(**lookup).values_list('id', flat=True)
+        )
+
+    def seed(self, options):
+        """Массовая вставка синтетических данных."""
+        prefix = f'bench-{token_hex(4)}'
+        password = make_password(prefix)
+        user_ids = self.bulk_ids(
+            User,
+            [
+                User(
+                    username=f'{prefix}-{index}',
+                    email=f'{prefix}-{index}@example.com',
+                    first_name='Bench',
+                    last_name=str(index),
+                    password=password
+                )
+                for index in range(options['users'])
+            ],
+            username__startswith=prefix
+        )
+        ingredient_ids = self.bulk_ids(
+            Ingredient,
+            [
+                Ingredient(name=f'{prefix} {index}', measurement_unit='г')
+                for index in range(options['ingredients'])
+            ],
+            name__startswith=prefix
+        )
+        tag_ids = self.bulk_ids(
+            Tag,
+            [
+                Tag(name=f'{prefix}-{index}', slug=f'{prefix}-{index}')
+                for index in range(TAGS_COUNT)
+            ],
+            slug__startswith=prefix
+        )
+        recipe_ids = self.bulk_ids(
+            Recipe,
+            [
+                Recipe(
+                    author_id=random.choice(user_ids),
+                    name=f'{prefix} {index}',
+                    image='recipes/images/bench.jpg',
+                    text=f'Синтетический рецепт номер {index}.',
+                    cooking_time=random.randint(1, 120)
+                )
+                for index in range(options['recipes'])
+            ],
+            name__startswith=prefix
+        )
+        per_recipe = min(options['ingredients_per_recipe'],
+                         len(ingredient_ids))
+        RecipeIngredient.objects.bulk_create(
+            [
+                RecipeIngredient(
+                    recipe_id=recipe_id,
+                    ingredient_id=ingredient_id,
+                    amount=random.randint(1, 500)
+                )
+                for recipe_id in recipe_ids
+                for ingredient_id in random.sample(ingredient_ids, per_recipe)
+            ],
+            batch_size=BATCH_SIZE
+        )
+        Recipe.tags.through.objects.bulk_create(
+            [
+                Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+                for recipe_id in recipe_ids
+                for tag_id in random.sample(tag_ids, 2)
+            ],
+            batch_size=BATCH_SIZE
+        )
+        for model, count in (
+            (Favorite, options['favorites']),
+            (ShoppingCart, options['carts']),
+        ):
+            model.objects.bulk_create(
+                [
+                    model(user_id=user_id, recipe_id=recipe_id)
+                    for user_id, recipe_id in random_pairs(
+                        user_ids, recipe_ids, count
+                    )
+                ],
+                batch_size=BATCH_SIZE
+            )
+        Subscription.objects.bulk_create(
+            [
+                Subscription(user_id=user_id, author_id=author_id)
+                for user_id, author_id in random_pairs(
+                    user_ids, user_ids, options['subscriptions'],
+                    exclude_same=True
+                )
+            ],
+            batch_size=BATCH_SIZE
+        )
+        recount_counters()
+        rebuild_shopping_cart_totals(user_ids)
+        rebuild_search_index()
+        self.reset_caches()
+        user_id = (
+            ShoppingCart.objects.filter(user_id__in=user_ids)
+            .values_list('user_id', flat=True).first()
+            or user_ids[0]
+        )
+        return {
+            'token': Token.objects.create(user_id=user_id).key,
+            'recipe_ids': recipe_ids,
+            'tag_slug': f'{prefix}-0',
+            'ingredient_prefix': prefix[:8],
+        }
+
+    def get_endpoints(self, data):
+        recipe_id = random.choice(data['recipe_ids'])
+        return {
+            'recipes_list_anonymous': ('/api/recipes/', False),
+            'recipes_list': ('/api/recipes/', True),
+            'recipes_filtered': (
+                f'/api/recipes/?tags={data["tag_slug"]}&is_favorited=1',
+                True
+            ),
+            'recipes_cursor': ('/api/recipes/?cursor=', True),
+            'recipes_search': ('/api/recipes/?search=рецепт номер 1', True),
+            'recipe_detail': (f'/api/recipes/{recipe_id}/', True),
+            'download_shopping_cart': (
+                '/api/recipes/download_shopping_cart/', True
+            ),
+            'subscriptions': (
+                '/api/users/subscriptions/?recipes_limit=3', True
+            ),
+            'ingredient_search': (
+                f'/api/ingredients/?name={data["ingredient_prefix"]}', False
+            ),
+        }
+
+    def run_benchmarks(self, data, repeat):
+        anonymous = Client()
+        authorized = Client(HTTP_AUTHORIZATION=f'Token {data["token"]}')
+        results = {}
+        for name, (url, auth) in self.get_endpoints(data).items():
+            client = authorized if auth else anonymous
+            timings, queries = [], []
+            for _ in range(repeat):
+                with CaptureQueriesContext(connection) as context:
+                    started = time.perf_counter()
+                    response = client.get(url)
+                    content = (
+                        b''.join(response.streaming_content)
+                        if response.streaming else response.content
+                    )
+                    timings.append(time.perf_counter() - started)
+                queries.append(len(context.captured_queries))
+            if response.status_code != 200:
+                raise CommandError(
+                    f'{url}: ответ {response.status_code}.'
+                )
+            results[name] = {
+                'url': url,
+                'status': response.status_code,
+                'p50_ms': round(percentile(timings, 0.5) * 1000, 2),
+                'p95_ms': round(percentile(timings, 0.95) * 1000, 2),
+                'queries': max(queries),
+                'bytes': len(content),
+            }
+        return results
+
+    def benchmark_encoding(self, data, repeat):
+        """Время кодирования и размеры одной страницы списка рецептов."""
+        response = Client(
+            HTTP_AUTHORIZATION=f'Token {data["token"]}'
+        ).get('/api/recipes/')
+        page = response.data
+        results = {}
+        for name, renderer in (
+            ('json', JSONRenderer()),
+            ('orjson', FastJSONRenderer()),
+        ):
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                content = renderer.render(page)
+                timings.append(time.perf_counter() - started)
+            results[f'{name}_p50_ms'] = round(
+                percentile(timings, 0.5) * 1000, 3
+            )
+        results['bytes'] = len(content)
+        results['gzip_bytes'] = len(compress_string(content))
+        if brotli is not None:
+            results['brotli_bytes'] = len(
+                brotli.compress(content, quality=BROTLI_QUALITY)
+            )
+        return results
@@ -0,0 +1,280 @@
+import asyncio
+import logging
+import random
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from hashlib import sha256
+from time import perf_counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_string
+
+from api.cache import is_shared_cache
+from core.constants_api import (
+    BROTLI_QUALITY,
+    COMPRESSIBLE_CONTENT_TYPES,
+    SLOW_SQL_MAX_LENGTH
+)
+from foodgram.db_routers import use_replica
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger('api.sql')
+
+STICKY_KEY = 'db:sticky:{}'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+current_query_stats = ContextVar('current_query_stats', default=None)
+
+
+class QueryStats:
+    """Обёртка execute_wrapper: число, суммарное время и самый долгий SQL.
+
+    measured - были ли запросы под замером: под ASGI синхронные
+    представления без track_queries выполняются вне него.
+    """
+
+    def __init__(self):
+        self.measured = False
+        self.count = 0
+        self.duration = 0.0
+        self.slowest = 0.0
+        self.slowest_sql = ''
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = perf_counter() - started
+            self.count += 1
+            self.duration += duration
+            if duration > self.slowest:
+                self.slowest = duration
+                self.slowest_sql = sql
+
+
+@contextmanager
+def track_queries(stats):
+    """Учёт запросов всех соединений текущего потока в stats."""
+    with ExitStack() as stack:
+        if stats is not None:
+            stats.measured = True
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+        yield stats
+
+
+class SQLTimingMiddleware:
+    """
+    Замер SQL для доли запросов SQL_TIMING_SAMPLE_RATE.
+
+    Добавляет заголовок Server-Timing и пишет строку в лог api.sql.
+    Запросы, выполненные при чтении потокового ответа, не учитываются.
+    Под ASGI запросы учитываются в потоках, запущенных через
+    track_queries(current_query_stats.get()) (run_in_thread); для
+    остальных представлений данные о БД не выводятся.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if random.random() >= settings.SQL_TIMING_SAMPLE_RATE:
+            return self.get_response(request)
+        started = perf_counter()
+        with track_queries(QueryStats()) as stats:
+            response = self.get_response(request)
+        return self.add_timing(request, response, stats, started)
+
+    async def __acall__(self, request):
+        if random.random() >= settings.SQL_TIMING_SAMPLE_RATE:
+            return await self.get_response(request)
+        stats = QueryStats()
+        started = perf_counter()
+        token = current_query_stats.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_query_stats.reset(token)
+        return self.add_timing(request, response, stats, started)
+
+    def add_timing(self, request, response, stats, started):
+        total = perf_counter() - started
+        view = getattr(request, 'sql_timing_view', None) or request.path
+        if not stats.measured:
+            response['Server-Timing'] = f'total;dur={total * 1000:.1f}'
+            logger.info(
+                'view=%s status=%s queries=unmeasured total_ms=%.1f',
+                view, response.status_code, total * 1000,
+                extra={
+                    'view': view,
+                    'status': response.status_code,
+                    'total_ms': round(total * 1000, 1),
+                }
+            )
+            return response
+        response['Server-Timing'] = (
+            f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} queries",'
+            f' app;dur={(total - stats.duration) * 1000:.1f},'
+            f' total;dur={total * 1000:.1f}'
+        )
+        logger.info(
+            'view=%s status=%s queries=%d db_ms=%.1f total_ms=%.1f '
+            'slowest_ms=%.1f slowest_sql="%s"',
+            view, response.status_code, stats.count, stats.duration * 1000,
+            total * 1000, stats.slowest * 1000,
+            stats.slowest_sql[:SLOW_SQL_MAX_LENGTH],
+            extra={
+                'view': view,
+                'status': response.status_code,
+                'queries': stats.count,
+                'db_ms': round(stats.duration * 1000, 1),
+                'total_ms': round(total * 1000, 1),
+                'slowest_ms': round(stats.slowest * 1000, 1),
+            }
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'cls', None)
+        if view_class is None:
+            request.sql_timing_view = view_func.__name__
+            return
+        method = request.method.lower()
+        actions = getattr(view_func, 'actions', None) or {}
+        request.sql_timing_view = (
+            f'{view_class.__name__}.{actions.get(method, method)}'
+        )
+
+
+class ReplicaMiddleware:
+    """
+    Чтение с реплик для безопасных запросов.
+
+    После изменяющего запроса клиент (по заголовку Authorization)
+    REPLICA_STICKY_SECONDS читает с основной БД и видит свои записи,
+    даже если реплики отстают. Отметка хранится в кэше; если кэш
+    локальный для воркера, следующий запрос может попасть в другой
+    процесс и не увидеть её, поэтому тогда чтение идёт с основной БД.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        token = use_replica.set(self.can_use_replica(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            use_replica.reset(token)
+        self.mark_sticky(request)
+        return response
+
+    async def __acall__(self, request):
+        token = use_replica.set(self.can_use_replica(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            use_replica.reset(token)
+        self.mark_sticky(request)
+        return response
+
+    def get_sticky_key(self, request):
+        authorization = request.META.get('HTTP_AUTHORIZATION')
+        if not authorization:
+            return None
+        return STICKY_KEY.format(sha256(authorization.encode()).hexdigest())
+
+    def can_use_replica(self, request):
+        if request.method not in SAFE_METHODS or not is_shared_cache():
+            return False
+        key = self.get_sticky_key(request)
+        return key is None or cache.get(key) is None
+
+    def mark_sticky(self, request):
+        key = self.get_sticky_key(request)
+        if key is not None and request.method not in SAFE_METHODS:
+            cache.set(key, 1, settings.REPLICA_STICKY_SECONDS)
+
+
+def get_accepted_encodings(header):
+    """Кодировки из Accept-Encoding с ненулевым q."""
+    encodings = set()
+    for item in header.split(','):
+        coding, _, params = item.partition(';')
+        quality = 1.0
+        name, _, value = params.strip().partition('=')
+        if name.strip() == 'q':
+            try:
+                quality = float(value)
+            except ValueError:
+                continue
+        if quality > 0:
+            encodings.add(coding.strip().lower())
+    return encodings
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Сжатие ответов brotli (если установлен) или gzip.
+
+    Сжимаются текстовые и JSON-ответы не короче COMPRESSION_MIN_SIZE
+    байт, если клиент принимает кодировку. Потоковые ответы
+    не сжимаются.
+    """
+
+    def process_response(self, request, response):
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if (
+            response.streaming
+            or response.has_header('Content-Encoding')
+            or len(response.content) < settings.COMPRESSION_MIN_SIZE
+            or not response.get('Content-Type', '').startswith(
+                COMPRESSIBLE_CONTENT_TYPES
+            )
+        ):
+            return response
+        accepted = get_accepted_encodings(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        if brotli is not None and accepted & {'br', '*'}:
+            encoding = 'br'
+            content = brotli.compress(
+                response.content, quality=BROTLI_QUALITY
+            )
+        elif accepted & {'gzip', '*'}:
+            encoding = 'gzip'
+            content = compress_string(response.content)
+        else:
+            return response
+        if len(content) >= len(response.content):
+            return response
+        response.content = content
+        response['Content-Length'] = str(len(content))
+        response['Content-Encoding'] = encoding
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
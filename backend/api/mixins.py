@@ -0,0 +1,96 @@
+from hashlib import md5
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework import status
+from rest_framework.permissions import SAFE_METHODS
+
+from api.serializers import DynamicFieldsMixin
+from core.constants_api import FIELDS_QUERY_PARAM, OMIT_QUERY_PARAM
+
+
+class ConditionalGetMixin:
+    """Условные GET-запросы (ETag / Last-Modified).
+
+    Валидаторы считаются до выполнения представления, поэтому при
+    совпадении If-None-Match / If-Modified-Since ответ 304 отдаётся
+    без запроса объектов и сериализации.
+    """
+
+    def get_data_state(self):
+        """
+        Состояние данных для ETag.
+
+        По умолчанию - число строк и последнее updated_at таблицы:
+        они меняются при добавлении, изменении и удалении записей
+        любым процессом, в том числе импортом.
+        """
+        return tuple(self.queryset.model.objects.aggregate(
+            count=Count('id'),
+            updated_at=Max('updated_at')
+        ).values())
+
+    def get_validators(self, request, *args, **kwargs):
+        """ETag и время изменения; по умолчанию - по состоянию данных."""
+        count, updated_at = self.get_data_state()
+        etag = md5(
+            f'{count}:{updated_at}:{request.get_full_path()}'.encode()
+        ).hexdigest()
+        return etag, None
+
+    def conditional_response(self, method, request, *args, **kwargs):
+        etag, last_modified = self.get_validators(request, *args, **kwargs)
+        if etag is not None:
+            etag = quote_etag(etag)
+        if last_modified is not None:
+            last_modified = int(last_modified.timestamp())
+        response = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=last_modified
+        )
+        if response is None:
+            response = method(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+        if etag is not None:
+            response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+
+class SparseFieldsMixin:
+    """Выбор полей ответа параметрами fields и omit.
+
+    Параметры передаются сериализаторам с DynamicFieldsMixin
+    для безопасных методов; по is_field_requested представление
+    может не загружать данные для невыбранных полей.
+    """
+
+    def get_sparse_fields(self):
+        """Множества полей fields (или None) и omit из запроса."""
+        if self.request.method not in SAFE_METHODS:
+            return None, None
+        fields, omit = (
+            self.request.query_params.get(param)
+            for param in (FIELDS_QUERY_PARAM, OMIT_QUERY_PARAM)
+        )
+        return tuple(
+            None if value is None
+            else {name.strip() for name in value.split(',')}
+            for value in (fields, omit)
+        )
+
+    def is_field_requested(self, name):
+        fields, omit = self.get_sparse_fields()
+        return (
+            (fields is None or name in fields)
+            and (omit is None or name not in omit)
+        )
+
+    def get_serializer(self, *args, **kwargs):
+        if issubclass(self.get_serializer_class(), DynamicFieldsMixin):
+            kwargs['fields'], kwargs['omit'] = self.get_sparse_fields()
+        return super().get_serializer(*args, **kwargs)
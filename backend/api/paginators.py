@@ -1,10 +1,154 @@
+import base64
+import binascii
+import json
+from functools import reduce
+from operator import and_, or_
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
-from core.constants_api import PAGE_SIZE, PAGE_SIZE_QUERY_PARAM
+from core.constants_api import (
+    CURSOR_QUERY_PARAM,
+    PAGE_SIZE,
+    PAGE_SIZE_QUERY_PARAM
+)
 
 
 class PageLimitPagination(PageNumberPagination):
-    """Пагинация."""
+    """Пагинация.
+
+    По умолчанию работает постранично (`page`/`limit`). При наличии
+    параметра `cursor` (в том числе пустого) переключается на
+    keyset-пагинацию по полям `cursor_ordering` представления:
+    без COUNT(*) и OFFSET, стоимость страницы не зависит от глубины.
+    Результаты поиска (search) сортируются по релевантности и листаются
+    только постранично: RecipeFilter отклоняет cursor вместе с search.
+    """
 
     page_size_query_param = PAGE_SIZE_QUERY_PARAM
     page_size = PAGE_SIZE
+    cursor_query_param = CURSOR_QUERY_PARAM
+    cursor_ordering = ('-pub_date', '-id')
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.cursor_query_param in request.query_params
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+        return self.paginate_queryset_by_cursor(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_cursor_link(),
+            'previous': self.get_previous_cursor_link(),
+            'results': data
+        })
+
+    def paginate_queryset_by_cursor(self, queryset, request, view=None):
+        """Страница keyset-пагинации."""
+        self.request = request
+        self.ordering = getattr(view, 'cursor_ordering', self.cursor_ordering)
+        page_size = self.get_page_size(request)
+        values, reverse = self.decode_cursor(
+            request.query_params[self.cursor_query_param]
+        )
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(self.invert(field) for field in ordering)
+        queryset = queryset.order_by(*ordering)
+        if values is not None:
+            try:
+                queryset = queryset.filter(
+                    self.get_keyset_filter(ordering, values)
+                )
+            except (ValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+        self.page_results = results
+        self.has_next = has_more if not reverse else values is not None
+        self.has_previous = values is not None if not reverse else has_more
+        return results
+
+    @staticmethod
+    def invert(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def get_keyset_filter(ordering, values):
+        """Условие «строго после» для лексикографического порядка ключей."""
+        conditions = []
+        for index, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            equal = [
+                Q(**{previous.lstrip('-'): value})
+                for previous, value in zip(ordering[:index], values)
+            ]
+            conditions.append(
+                reduce(and_, equal, Q(**{f'{name}__{lookup}': values[index]}))
+            )
+        return reduce(or_, conditions)
+
+    def get_key(self, obj):
+        key = []
+        for field in self.ordering:
+            value = obj
+            for attr in field.lstrip('-').split('__'):
+                value = getattr(value, attr)
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            key.append(value)
+        return key
+
+    def encode_cursor(self, obj, reverse=False):
+        payload = {'k': self.get_key(obj)}
+        if reverse:
+            payload['r'] = 1
+        data = json.dumps(payload).encode()
+        return base64.urlsafe_b64encode(data).decode()
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            values = payload['k']
+        except (binascii.Error, ValueError, TypeError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if (
+            not isinstance(values, list)
+            or len(values) != len(self.ordering)
+            or not all(
+                isinstance(value, (str, int)) and not isinstance(value, bool)
+                for value in values
+            )
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        return values, bool(payload.get('r'))
+
+    def get_cursor_link(self, cursor):
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_next_cursor_link(self):
+        if not self.has_next or not self.page_results:
+            return None
+        return self.get_cursor_link(self.encode_cursor(self.page_results[-1]))
+
+    def get_previous_cursor_link(self):
+        if not self.has_previous or not self.page_results:
+            return None
+        return self.get_cursor_link(
+            self.encode_cursor(self.page_results[0], reverse=True)
+        )
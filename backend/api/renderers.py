@@ -0,0 +1,60 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer на orjson.
+
+    Без orjson, с отступами (indent) или ensure_ascii используется
+    стандартная реализация DRF; типы, которых orjson не знает,
+    кодируются encoder_class DRF.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            data is None
+            or orjson is None
+            or self.ensure_ascii
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME
+                | orjson.OPT_NON_STR_KEYS
+            )
+        except TypeError:
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+        # Как и DRF, экранируем разделители строк для встраивания в JS.
+        return ret.replace(
+            '\u2028'.encode(), b'\\u2028'
+        ).replace('\u2029'.encode(), b'\\u2029')
+
+
+class PlainTextRenderer(BaseRenderer):
+    """Рендерер простого текста (для списка покупок и ошибок к нему)."""
+
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            data = '\n'.join(f'{key}: {value}' for key, value in data.items())
+        return str(data).encode(self.charset)
+
+
+class CSVRenderer(PlainTextRenderer):
+    """Рендерер CSV."""
+
+    media_type = 'text/csv'
+    format = 'csv'
@@ -1,10 +1,17 @@
+import json
+
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
+from django.http import QueryDict
 from djoser.serializers import UserSerializer as DjoserUserSerializer
 from rest_framework import serializers, status
 from rest_framework.response import Response
 
-from api.fields import Base64ImageField
+from api.fields import Base64ImageField, ImageRenditionField
+from core.constants_api import MAX_BATCH_SIZE
+from core.images import delete_renditions, make_renditions
 from recipes.models import (
     Favorite,
     Ingredient,
@@ -13,16 +20,69 @@ from recipes.models import (
     ShoppingCart,
     Tag
 )
+from recipes.services import (
+    change_recipe_in_shopping_carts,
+    get_latest_recipes_by_author,
+    get_recipe_amounts
+)
 from users.models import Subscription
 
 
 User = get_user_model()
 
 
-class UserSerializer(DjoserUserSerializer):
+def get_recipes_limit(request):
+    """Значение параметра recipes_limit или None."""
+    recipes_limit = request.query_params.get('recipes_limit', '')
+    if recipes_limit.isdigit():
+        return int(recipes_limit)
+    return None
+
+
+class DynamicFieldsMixin:
+    """Сериализатор только с полями fields и без полей omit."""
+
+    def __init__(self, *args, fields=None, omit=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name in list(self.fields):
+            if (
+                fields is not None and name not in fields
+                or omit is not None and name in omit
+            ):
+                self.fields.pop(name)
+
+
+class ImageRenditionsMixin:
+    """Создание уменьшенных копий загруженных изображений.
+
+    Копии заменённого изображения удаляются.
+    """
+
+    rendition_fields = ()
+
+    def save(self, **kwargs):
+        previous = {
+            field: getattr(self.instance, field)
+            for field in self.rendition_fields
+            if self.instance is not None and field in self.validated_data
+        }
+        instance = super().save(**kwargs)
+        for field in self.rendition_fields:
+            if field not in self.validated_data:
+                continue
+            field_file = getattr(instance, field)
+            make_renditions(field_file)
+            old_file = previous.get(field)
+            if old_file and old_file.name != field_file.name:
+                delete_renditions(old_file)
+        return instance
+
+
+class UserSerializer(DynamicFieldsMixin, DjoserUserSerializer):
     """Сериализатор пользователя."""
 
     is_subscribed = serializers.SerializerMethodField()
+    avatar_thumb = ImageRenditionField('thumb', source='avatar')
 
     class Meta:
         model = User
@@ -33,10 +93,13 @@ class UserSerializer(DjoserUserSerializer):
             'first_name',
             'last_name',
             'avatar',
+            'avatar_thumb',
             'is_subscribed',
         )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         user = self.context.get('request').user
         return (
             user.is_authenticated
@@ -73,10 +136,11 @@ class UserCreateSerializer(DjoserUserSerializer):
         return User.objects.create_user(**validated_data)
 
 
-class AvatarSerializer(serializers.ModelSerializer):
+class AvatarSerializer(ImageRenditionsMixin, serializers.ModelSerializer):
     """Сериализатор аватара."""
 
     avatar = Base64ImageField()
+    rendition_fields = ('avatar',)
 
     class Meta:
         model = User
@@ -155,10 +219,13 @@ class RecipeIngredientCreateSerializer(serializers.ModelSerializer):
         return value
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Сериализатор рецептов."""
 
     image = Base64ImageField()
+    image_thumb = ImageRenditionField('thumb', source='image')
+    image_medium = ImageRenditionField('medium', source='image')
+    image_webp = ImageRenditionField('webp', source='image')
     author = UserSerializer(read_only=True)
     tags = TagSerializer(many=True)
     ingredients = RecipreIngredientSerializer(
@@ -175,6 +242,9 @@ class RecipeSerializer(serializers.ModelSerializer):
             'ingredients',
             'tags',
             'image',
+            'image_thumb',
+            'image_medium',
+            'image_webp',
             'name',
             'author',
             'text',
@@ -184,6 +254,8 @@ class RecipeSerializer(serializers.ModelSerializer):
         )
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
@@ -193,6 +265,8 @@ class RecipeSerializer(serializers.ModelSerializer):
         ).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
@@ -202,10 +276,14 @@ class RecipeSerializer(serializers.ModelSerializer):
         ).exists()
 
 
-class RecipeCreateSerializer(serializers.ModelSerializer):
+class RecipeCreateSerializer(
+    ImageRenditionsMixin,
+    serializers.ModelSerializer
+):
     """Сериализатор создания рецептов."""
 
     image = Base64ImageField()
+    rendition_fields = ('image',)
     ingredients = RecipeIngredientCreateSerializer(many=True)
     tags = serializers.PrimaryKeyRelatedField(
         queryset=Tag.objects.all(),
@@ -225,18 +303,39 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             'cooking_time'
         )
 
+    def to_internal_value(self, data):
+        if isinstance(data, QueryDict):
+            data = self.parse_multipart(data)
+        return super().to_internal_value(data)
+
+    @staticmethod
+    def parse_multipart(data):
+        """Данные multipart/form-data в виде JSON-структуры.
+
+        Теги передаются повторяющимся полем `tags`,
+        ингредиенты - JSON-строкой в поле `ingredients`.
+        """
+        parsed = data.dict()
+        if 'tags' in data:
+            parsed['tags'] = data.getlist('tags')
+        if isinstance(parsed.get('ingredients'), str):
+            try:
+                parsed['ingredients'] = json.loads(parsed['ingredients'])
+            except ValueError:
+                raise serializers.ValidationError(
+                    {'ingredients': ['Ожидается JSON-список ингредиентов.']}
+                )
+        return parsed
+
     def validate_tags(self, value):
         if len(value) == 0:
             raise serializers.ValidationError(
                 'Должно быть отмечено не меньше 1 тега!'
             )
-        tag_list = []
-        for val in value:
-            if val in tag_list:
-                raise serializers.ValidationError(
-                    'Теги должны быть уникальными!'
-                )
-            tag_list.append(val)
+        if len(set(value)) != len(value):
+            raise serializers.ValidationError(
+                'Теги должны быть уникальными!'
+            )
         return value
 
     def validate_ingredients(self, value):
@@ -247,26 +346,24 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
                 }
             )
 
-        ingredient_list = []
-        for val in value:
-            try:
-                ingredient = Ingredient.objects.get(id=val['id'])
-            except Ingredient.DoesNotExist:
-                raise serializers.ValidationError(
-                    'Введен не существующий ингредиент!'
-                )
-            if ingredient in ingredient_list:
-                raise serializers.ValidationError(
-                    'Ингридиенты должны быть уникальными!'
-                )
-            ingredient_list.append(ingredient)
-            if val['amount'] <= 0:
-                raise serializers.ValidationError(
-                    {
-                        'ingredients':
-                        'Значение ингредиента должно быть больше 0!'
-                    }
-                )
+        ingredient_ids = {val['id'] for val in value}
+        if len(ingredient_ids) != len(value):
+            raise serializers.ValidationError(
+                'Ингридиенты должны быть уникальными!'
+            )
+        if Ingredient.objects.filter(
+            id__in=ingredient_ids
+        ).count() != len(ingredient_ids):
+            raise serializers.ValidationError(
+                'Введен не существующий ингредиент!'
+            )
+        if any(val['amount'] <= 0 for val in value):
+            raise serializers.ValidationError(
+                {
+                    'ingredients':
+                    'Значение ингредиента должно быть больше 0!'
+                }
+            )
         return value
 
     def validate_cooking_time(self, value):
@@ -277,19 +374,29 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         return value
 
     def create_ingredients(self, ingredients, recipe):
-        for element in ingredients:
-            id = element['id']
-            ingredient = Ingredient.objects.get(pk=id)
-            amount = element['amount']
-            RecipeIngredient.objects.create(
-                ingredient=ingredient,
+        """Ингредиенты рецепта одним INSERT.
+
+        bulk_create не отправляет сигналов, поэтому суммы списков
+        покупок обновляются здесь.
+        """
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                ingredient_id=element['id'],
                 recipe=recipe,
-                amount=amount
+                amount=element['amount']
             )
+            for element in ingredients
+        )
+        change_recipe_in_shopping_carts(
+            recipe.id,
+            {},
+            get_recipe_amounts(recipe)
+        )
 
     def create_tags(self, tags, recipe):
         recipe.tags.set(tags)
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
@@ -308,6 +415,7 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         )
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         instance.ingredients.clear()
         self.create_ingredients(
@@ -320,6 +428,15 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         )
 
     def to_representation(self, instance):
+        prefetch_related_objects(
+            (instance,),
+            Prefetch(
+                'recipe_recipeingredients',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient'
+                )
+            )
+        )
         serializer = RecipeSerializer(
             instance,
             context={
@@ -329,6 +446,19 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         return serializer.data
 
 
+class RecipeIdsSerializer(serializers.Serializer):
+    """Список id рецептов для пакетных операций."""
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_BATCH_SIZE
+    )
+
+    def validate_ids(self, value):
+        return list(dict.fromkeys(value))
+
+
 class FavoriteSerializer(serializers.ModelSerializer):
     """Сериализатор избранных рецептов."""
 
@@ -383,12 +513,17 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
 class RecipesShortSerializer(serializers.ModelSerializer):
     """Сериализатор рецептов, короткая версия."""
 
+    image_thumb = ImageRenditionField('thumb', source='image')
+    image_webp = ImageRenditionField('webp', source='image')
+
     class Meta:
         model = Recipe
         fields = (
             'id',
             'name',
             'image',
+            'image_thumb',
+            'image_webp',
             'cooking_time'
         )
 
@@ -470,6 +605,7 @@ class SubscriptionsSerializer(UserSerializer):
     first_name = serializers.ReadOnlyField(source="author.first_name")
     last_name = serializers.ReadOnlyField(source="author.last_name")
     avatar = serializers.ImageField(source='author.avatar')
+    avatar_thumb = ImageRenditionField('thumb', source='author.avatar')
     recipes = serializers.SerializerMethodField(method_name='get_recipes')
     recipes_count = serializers.SerializerMethodField(
         method_name='get_recipes_count'
@@ -487,18 +623,25 @@ class SubscriptionsSerializer(UserSerializer):
             'first_name',
             'last_name',
             'avatar',
+            'avatar_thumb',
             'is_subscribed',
             'recipes',
             'recipes_count'
         )
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        if request.GET.get('recipes_limit'):
-            recipe_limit = int(request.GET.get('recipes_limit'))
-            queryset = Recipe.objects.filter(author=obj.author)[:recipe_limit]
+        """Рецепты автора.
+
+        Берутся из контекста `recipes` ({author_id: [Recipe]}),
+        если представление загрузило их заранее.
+        """
+        if 'recipes' in self.context:
+            queryset = self.context['recipes'].get(obj.author_id, ())
         else:
-            queryset = Recipe.objects.filter(author=obj.author)
+            queryset = get_latest_recipes_by_author(
+                (obj.author_id,),
+                get_recipes_limit(self.context.get('request'))
+            )[obj.author_id]
         serializer = RecipesShortSerializer(
             queryset,
             many=True,
@@ -508,13 +651,11 @@ class SubscriptionsSerializer(UserSerializer):
 
     def get_recipes_count(self, obj):
         """Количество рецептов автора."""
-        return Recipe.objects.filter(author=obj.author).count()
+        return obj.author.recipes_count
 
     def get_is_subscribed(self, obj):
-        """Метод проверки подписки"""
-        request = self.context.get('request')
-        return Subscription.objects.filter(
-            author=obj.author, user=request.user).exists()
+        """Сериализуются только подписки текущего пользователя."""
+        return True
 
 
 class SubscribedSerislizer(serializers.ModelSerializer):
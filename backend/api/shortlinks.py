@@ -0,0 +1,47 @@
+import string
+from functools import lru_cache
+
+from urlshortner.models import Url
+
+from core.constants_api import SHORT_LINK_CACHE_SIZE, SHORT_LINK_PREFIX
+
+ALPHABET = string.digits + string.ascii_letters
+
+
+def encode_recipe_id(recipe_id):
+    """Короткий код рецепта: префикс и id в base62."""
+    recipe_id = int(recipe_id)
+    code = ''
+    while True:
+        recipe_id, remainder = divmod(recipe_id, len(ALPHABET))
+        code = ALPHABET[remainder] + code
+        if not recipe_id:
+            return SHORT_LINK_PREFIX + code
+
+
+def decode_recipe_id(code):
+    """id рецепта по короткому коду или None."""
+    if not code.startswith(SHORT_LINK_PREFIX) or len(code) < 2:
+        return None
+    recipe_id = 0
+    for char in code[len(SHORT_LINK_PREFIX):]:
+        index = ALPHABET.find(char)
+        if index < 0:
+            return None
+        recipe_id = recipe_id * len(ALPHABET) + index
+    return recipe_id
+
+
+@lru_cache(maxsize=SHORT_LINK_CACHE_SIZE)
+def resolve_short_link(code):
+    """Адрес перехода по короткой ссылке или None.
+
+    Коды рецептов вычисляются без БД; ссылки, созданные ранее
+    через urlshortner, один раз читаются из БД и остаются в кэше.
+    """
+    recipe_id = decode_recipe_id(code)
+    if recipe_id is not None:
+        return f'/recipes/{recipe_id}/'
+    return Url.objects.filter(
+        short_url=code
+    ).values_list('url', flat=True).first()
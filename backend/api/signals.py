@@ -0,0 +1,221 @@
+from django.contrib.auth import get_user_model
+from django.core.signals import request_started
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_save
+)
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api.authentication import invalidate_token, invalidate_user
+from api.cache import bump_version, incr_stat
+from api.connections import (
+    check_connections,
+    incr_connection_stat,
+    mark_connection_checked
+)
+from api.ingredient_index import ingredient_index
+from core.images import delete_renditions
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    Tag
+)
+from recipes.search import delete_search_index, update_search_index
+from recipes.services import (
+    RECIPE_COUNTER_FIELDS,
+    change_counter,
+    change_recipe_in_shopping_carts,
+    change_shopping_cart_totals
+)
+from users.models import Subscription
+
+User = get_user_model()
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_index(**kwargs):
+    """Сброс индекса ингредиентов при их изменении."""
+    ingredient_index.invalidate()
+
+
+def bump_recipes_version():
+    bump_version('recipes')
+    incr_stat('recipes', 'invalidations')
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+@receiver((post_save, post_delete), sender=Tag)
+@receiver((post_save, post_delete), sender=Ingredient)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_list_cache(**kwargs):
+    """Сброс кэша списка рецептов после фиксации изменений."""
+    transaction.on_commit(bump_recipes_version)
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search_index(instance, update_fields=None, **kwargs):
+    """Обновление индекса поиска при сохранении рецепта."""
+    if update_fields is not None and not {'name', 'text'} & set(
+        update_fields
+    ):
+        return
+    update_search_index([instance.pk])
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_recipe_search_index(instance, **kwargs):
+    delete_search_index([instance.pk])
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_cached_token(instance, **kwargs):
+    """Сброс кэша токена при выходе."""
+    transaction.on_commit(lambda: invalidate_token(instance.key))
+
+
+@receiver((post_save, post_delete), sender=User)
+def invalidate_cached_user(instance, update_fields=None, **kwargs):
+    """Сброс кэша пользователя (пароль, блокировка и другие данные)."""
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    transaction.on_commit(lambda: invalidate_user(instance.pk))
+
+
+@receiver((post_save, post_delete), sender=User)
+def invalidate_recipe_list_cache_by_author(update_fields=None, **kwargs):
+    """Сброс кэша при изменении пользователя (данные автора в списке).
+
+    Обновление только last_login при входе кэш не сбрасывает.
+    """
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    transaction.on_commit(bump_recipes_version)
+
+
+@receiver(connection_created)
+def count_opened_connection(connection, **kwargs):
+    incr_connection_stat('opened')
+    mark_connection_checked(connection)
+
+
+request_started.connect(check_connections)
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_cart_totals(instance, created, **kwargs):
+    """Суммы ингредиентов при добавлении рецепта в список покупок."""
+    if created:
+        change_shopping_cart_totals(instance.user_id, (instance.recipe_id,))
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def remove_from_shopping_cart_totals(instance, **kwargs):
+    """Суммы ингредиентов при удалении рецепта из списка покупок.
+
+    При удалении рецепта каскадом ингредиенты могут быть уже удалены,
+    тогда их вычел remove_recipe_ingredient_from_carts.
+    """
+    change_shopping_cart_totals(
+        instance.user_id,
+        (instance.recipe_id,),
+        sign=-1
+    )
+
+
+@receiver(pre_save, sender=RecipeIngredient)
+def remember_recipe_ingredient(instance, **kwargs):
+    instance.saved_amounts = dict(
+        RecipeIngredient.objects.filter(
+            pk=instance.pk
+        ).values_list('ingredient_id', 'amount')
+    ) if instance.pk else {}
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def update_recipe_ingredient_in_carts(instance, **kwargs):
+    """Суммы списков покупок при изменении ингредиента (админка)."""
+    change_recipe_in_shopping_carts(
+        instance.recipe_id,
+        getattr(instance, 'saved_amounts', {}),
+        {instance.ingredient_id: instance.amount}
+    )
+
+
+@receiver(post_delete, sender=RecipeIngredient)
+def remove_recipe_ingredient_from_carts(instance, **kwargs):
+    """Суммы списков покупок при удалении ингредиента или рецепта."""
+    change_recipe_in_shopping_carts(
+        instance.recipe_id,
+        {instance.ingredient_id: instance.amount},
+        {}
+    )
+
+
+IMAGE_FIELDS = {
+    Recipe: 'image',
+    User: 'avatar',
+}
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=User)
+def remove_image_renditions(sender, instance, **kwargs):
+    """Удаление уменьшенных копий изображения удалённого объекта."""
+    field_file = getattr(instance, IMAGE_FIELDS[sender])
+    transaction.on_commit(lambda: delete_renditions(field_file))
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def increment_recipe_list_counter(sender, instance, created, **kwargs):
+    """Счётчик рецепта при добавлении в избранное/список покупок."""
+    if created:
+        change_counter(
+            Recipe,
+            instance.recipe_id,
+            RECIPE_COUNTER_FIELDS[sender]
+        )
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def decrement_recipe_list_counter(sender, instance, **kwargs):
+    change_counter(
+        Recipe,
+        instance.recipe_id,
+        RECIPE_COUNTER_FIELDS[sender],
+        -1
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def increment_recipes_count(instance, created, **kwargs):
+    """Число рецептов автора; bulk_create учитывается recount."""
+    if created:
+        change_counter(User, instance.author_id, 'recipes_count')
+
+
+@receiver(post_delete, sender=Recipe)
+def decrement_recipes_count(instance, **kwargs):
+    change_counter(User, instance.author_id, 'recipes_count', -1)
+
+
+@receiver(post_save, sender=Subscription)
+def increment_subscribers_count(instance, created, **kwargs):
+    """Число подписчиков автора."""
+    if created:
+        change_counter(User, instance.author_id, 'subscribers_count')
+
+
+@receiver(post_delete, sender=Subscription)
+def decrement_subscribers_count(instance, **kwargs):
+    change_counter(User, instance.author_id, 'subscribers_count', -1)
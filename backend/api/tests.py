@@ -0,0 +1,125 @@
+from django.core.cache import cache
+from django.test import AsyncClient, TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    Tag
+)
+from users.models import Subscription, User
+
+RECIPES_URL = '/api/recipes/'
+RECIPES_COUNT = 8
+PAGE_SIZES = (2, 6)
+
+
+class RecipeListQueriesTest(TestCase):
+    """Число запросов списка рецептов не зависит от размера страницы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.author = (
+            User.objects.create_user(
+                username=username,
+                email=f'{username}@example.com',
+                password='password12345',
+                first_name='Имя',
+                last_name='Фамилия'
+            )
+            for username in ('user', 'author')
+        )
+        cls.token = Token.objects.create(user=cls.user)
+        tags = [
+            Tag.objects.create(name=f'Тег {index}', slug=f'tag{index}')
+            for index in range(3)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {index}',
+                measurement_unit='г'
+            )
+            for index in range(4)
+        ]
+        for index in range(RECIPES_COUNT):
+            recipe = Recipe.objects.create(
+                author=cls.author,
+                name=f'Рецепт {index}',
+                image='recipes/images/recipe.png',
+                text='Описание',
+                cooking_time=10
+            )
+            recipe.tags.set(tags[:index % 3 + 1])
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe,
+                    ingredient=ingredient,
+                    amount=5
+                )
+                for ingredient in ingredients[:index % 4 + 1]
+            )
+            if index % 2:
+                Favorite.objects.create(user=cls.user, recipe=recipe)
+                ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        Subscription.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = APIClient()
+        self.authorized_client = APIClient()
+        self.authorized_client.credentials(
+            HTTP_AUTHORIZATION=f'Token {self.token.key}'
+        )
+
+    def assert_list_queries(self, client, queries):
+        for limit in PAGE_SIZES:
+            with self.subTest(limit=limit):
+                cache.clear()
+                with self.assertNumQueries(queries):
+                    response = client.get(RECIPES_URL, {'limit': limit})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data['results']), limit)
+
+    def test_anonymous_list_queries(self):
+        """Анонимный список: count, рецепты и три prefetch."""
+        self.assert_list_queries(self.guest_client, 5)
+
+    def test_authorized_list_queries(self):
+        """С токеном добавляется только запрос токена и пользователя."""
+        self.assert_list_queries(self.authorized_client, 6)
+
+    def test_authorized_list_flags(self):
+        response = self.authorized_client.get(
+            RECIPES_URL,
+            {'limit': RECIPES_COUNT}
+        )
+        recipes = response.data['results']
+        self.assertTrue(all(
+            recipe['author']['is_subscribed'] for recipe in recipes
+        ))
+        self.assertEqual(
+            sum(recipe['is_favorited'] for recipe in recipes),
+            RECIPES_COUNT // 2
+        )
+        self.assertEqual(
+            sum(recipe['is_in_shopping_cart'] for recipe in recipes),
+            RECIPES_COUNT // 2
+        )
+
+    def test_detail_invalid_pk(self):
+        response = self.guest_client.get(f'{RECIPES_URL}abc/')
+        self.assertEqual(response.status_code, 404)
+
+    async def test_download_shopping_cart_asgi(self):
+        """Под ASGI потоковая выгрузка не обращается к БД в цикле событий."""
+        response = await AsyncClient().get(
+            f'{RECIPES_URL}download_shopping_cart/',
+            authorization=f'Token {self.token.key}'
+        )
+        self.assertEqual(response.status_code, 200)
+        content = b''.join(response.streaming_content).decode()
+        self.assertEqual(len(content.splitlines()), 4)
@@ -1,8 +1,10 @@
 from django.conf import settings
 from django.urls import include, path
 
+from api.async_views import async_routes
 from api.views import (
     IngredientViewSet,
+    MetricsView,
     RecipeViewSet,
     TagViewSet,
     UserViewSet
@@ -37,7 +39,12 @@ router_v1.register(
     RecipeViewSet,
     basename='recipes'
 )
+router_urls = router_v1.urls
+if settings.ASYNC_API_VIEWS:
+    router_urls = async_routes(router_urls)
+
 urlpatterns = [
     path('auth/', include('djoser.urls.authtoken')),
-    path('', include(router_v1.urls)),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
+    path('', include(router_urls)),
 ]
@@ -1,62 +1,149 @@
 import os
+from hashlib import md5
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http import Http404, HttpResponse
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import (
+    BooleanField,
+    Count,
+    Exists,
+    F,
+    Max,
+    OuterRef,
+    Prefetch,
+    Value
+)
+from django.http import (
+    Http404,
+    HttpResponsePermanentRedirect,
+    StreamingHttpResponse
+)
 from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_vary_headers
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet as DjoserViewSet
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import (
     AllowAny,
+    IsAdminUser,
     IsAuthenticated,
     IsAuthenticatedOrReadOnly
 )
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
-from urlshortner.utils import shorten_url
+from rest_framework.views import APIView
 
+from api.cache import (
+    get_recipe_list_stats,
+    incr_stat,
+    recipe_list_cache_key
+)
+from api.connections import get_connection_stats
+from api.exporters import SHOPPING_CART_EXPORTERS
 from api.filters import IngredientFilter, RecipeFilter
+from api.ingredient_index import ingredient_index
+from api.mixins import ConditionalGetMixin, SparseFieldsMixin
 from api.paginators import PageLimitPagination
 from api.permissions import IsAuthorAdminOrReadOnly
+from api.renderers import CSVRenderer, PlainTextRenderer
 from api.serializers import (
     AvatarSerializer,
     IngredientSerializer,
     RecipeCreateSerializer,
+    RecipeIdsSerializer,
     RecipeSerializer,
     RecipesShortSerializer,
     SubscribedSerislizer,
     SubscriptionsSerializer,
     TagSerializer,
     UserCreateSerializer,
-    UserSerializer
+    UserSerializer,
+    get_recipes_limit
 )
+from api.shortlinks import encode_recipe_id, resolve_short_link
+from core.images import delete_renditions
 from recipes.models import (
     Favorite,
     Ingredient,
     Recipe,
     RecipeIngredient,
     ShoppingCart,
+    ShoppingCartIngredient,
     Tag
 )
+from recipes.services import (
+    add_recipes_to_list,
+    get_latest_recipes_by_author,
+    remove_recipes_from_list
+)
 from users.models import Subscription
 
 
 User = get_user_model()
 
+RECIPE_FLAG_MODELS = {
+    'is_favorited': Favorite,
+    'is_in_shopping_cart': ShoppingCart,
+}
+
+
+def annotate_recipe_flags(queryset, user, flags=tuple(RECIPE_FLAG_MODELS)):
+    """Аннотация рецептов флагами избранного и списка покупок."""
+    if user.is_anonymous:
+        return queryset.annotate(**{
+            flag: Value(False, output_field=BooleanField())
+            for flag in flags
+        })
+    return queryset.annotate(**{
+        flag: Exists(
+            RECIPE_FLAG_MODELS[flag].objects.filter(
+                user=user,
+                recipe=OuterRef('pk')
+            )
+        )
+        for flag in flags
+    })
+
 
-class UserViewSet(DjoserViewSet):
+def annotate_is_subscribed(queryset, user):
+    """Аннотация пользователей флагом подписки текущего пользователя."""
+    if user.is_anonymous:
+        return queryset.annotate(
+            is_subscribed=Value(False, output_field=BooleanField())
+        )
+    return queryset.annotate(
+        is_subscribed=Exists(
+            Subscription.objects.filter(
+                user=user,
+                author=OuterRef('pk')
+            )
+        )
+    )
+
+
+class UserViewSet(SparseFieldsMixin, DjoserViewSet):
     """Вьюсет пользователя."""
 
     queryset = User.objects.all()
     permission_classes = (IsAuthenticatedOrReadOnly,)
     pagination_class = PageLimitPagination
+    cursor_ordering = ('-id',)
 
     def get_serializer_class(self):
         if self.action == 'create':
             return UserCreateSerializer
         return UserSerializer
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if not self.is_field_requested('is_subscribed'):
+            return queryset
+        return annotate_is_subscribed(queryset, self.request.user)
+
     def get_permissions(self):
         if self.action == 'me':
             return (IsAuthenticated(),)
@@ -90,6 +177,7 @@ class UserViewSet(DjoserViewSet):
             data=request.data
         )
         serializer.is_valid(raise_exception=True)
+        delete_renditions(request.user.avatar)
         request.user.avatar.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -111,7 +199,8 @@ class UserViewSet(DjoserViewSet):
             context={'request': request}
         )
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        with transaction.atomic():
+            serializer.save()
         return Response(
             serializer.data,
             status=status.HTTP_201_CREATED
@@ -141,17 +230,23 @@ class UserViewSet(DjoserViewSet):
         detail=False,
     )
     def subscriptions(self, request):
-        queryset = Subscription.objects.filter(user=request.user)
+        queryset = Subscription.objects.filter(
+            user=request.user
+        ).select_related('author').order_by('-id')
         pages = self.paginate_queryset(queryset)
+        recipes = get_latest_recipes_by_author(
+            [subscription.author_id for subscription in pages],
+            get_recipes_limit(request)
+        )
         serializer = SubscriptionsSerializer(
             pages,
             many=True,
-            context={'request': request}
+            context={'request': request, 'recipes': recipes}
         )
         return self.get_paginated_response(serializer.data)
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет ингредиентов."""
 
     queryset = Ingredient.objects.all()
@@ -163,29 +258,180 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
         'name',
     )
 
+    def get_data_state(self):
+        """Состояние из индекса: сверяется с БД раз в INGREDIENT_INDEX_TTL."""
+        return ingredient_index.get_current_state()
+
+    def search(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if name:
+            return Response(ingredient_index.search(name))
+        return super().list(request, *args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            self.search,
+            request,
+            *args,
+            **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().retrieve,
+            request,
+            *args,
+            **kwargs
+        )
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+
+class TagViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет тегов."""
 
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (AllowAny,)
 
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().list,
+            request,
+            *args,
+            **kwargs
+        )
 
-class RecipeViewSet(viewsets.ModelViewSet):
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().retrieve,
+            request,
+            *args,
+            **kwargs
+        )
+
+
+class RecipeViewSet(
+    SparseFieldsMixin,
+    ConditionalGetMixin,
+    viewsets.ModelViewSet
+):
     """Вьюсет рецептов."""
 
     queryset = Recipe.objects.all()
     permission_classes = (IsAuthorAdminOrReadOnly,)
     pagination_class = PageLimitPagination
+    cursor_ordering = ('-pub_date', '-id')
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
+    def get_queryset(self):
+        """Рецепты с данными только для запрошенных полей."""
+        user = self.request.user
+        prefetches = {
+            'author': Prefetch(
+                'author',
+                queryset=annotate_is_subscribed(User.objects.all(), user)
+            ),
+            'tags': 'tags',
+            'ingredients': Prefetch(
+                'recipe_recipeingredients',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient'
+                )
+            ),
+        }
+        queryset = super().get_queryset().prefetch_related(*(
+            prefetch for field, prefetch in prefetches.items()
+            if self.is_field_requested(field)
+        ))
+        if not self.is_field_requested('text'):
+            queryset = queryset.defer('text')
+        return annotate_recipe_flags(queryset, user, [
+            flag for flag in RECIPE_FLAG_MODELS
+            if self.is_field_requested(flag)
+            or flag in self.request.query_params
+        ])
+
+    def get_validators(self, request, *args, **kwargs):
+        """
+        ETag рецепта по данным ответа и флагам пользователя.
+
+        Кроме времени изменения рецепта учитываются поля автора,
+        число и время изменения тегов и ингредиентов.
+        """
+        user = request.user
+        try:
+            recipes = Recipe.objects.filter(pk=kwargs['pk'])
+        except (TypeError, ValueError):
+            return None, None
+        recipe = annotate_recipe_flags(
+            recipes,
+            user
+        ).annotate(
+            tags_count=Count('tags', distinct=True),
+            tags_updated_at=Max('tags__updated_at'),
+            ingredients_updated_at=Max('ingredients__updated_at')
+        ).values(
+            'updated_at',
+            'tags_count',
+            'tags_updated_at',
+            'ingredients_updated_at',
+            'author__username',
+            'author__first_name',
+            'author__last_name',
+            'author__avatar',
+            'is_favorited',
+            'is_in_shopping_cart',
+            'author_id'
+        ).first()
+        if recipe is None:
+            return None, None
+        is_subscribed = user.is_authenticated and Subscription.objects.filter(
+            user=user,
+            author_id=recipe['author_id']
+        ).exists()
+        etag = md5(
+            ':'.join(
+                str(value) for value in (
+                    request.get_full_path(),
+                    is_subscribed,
+                    *recipe.values()
+                )
+            ).encode()
+        ).hexdigest()
+        if user.is_anonymous:
+            return etag, recipe['updated_at']
+        return etag, None
+
+    def retrieve(self, request, *args, **kwargs):
+        response = self.conditional_response(
+            super().retrieve,
+            request,
+            *args,
+            **kwargs
+        )
+        patch_vary_headers(response, ('Authorization',))
+        return response
+
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
             return RecipeCreateSerializer
         return RecipeSerializer
 
+    def list(self, request, *args, **kwargs):
+        """Список рецептов; для анонимных пользователей - из кэша."""
+        if not request.user.is_anonymous:
+            return super().list(request, *args, **kwargs)
+        key = recipe_list_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            incr_stat('recipes', 'hits')
+            return Response(data)
+        incr_stat('recipes', 'misses')
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, settings.RECIPE_LIST_CACHE_TIMEOUT)
+        return response
+
     def add_recipe(self, request, pk, model):
         """Метод добавления рецепта в избранное/список покупок."""
         user = request.user
@@ -204,10 +450,11 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 {'errors': f'Рецепт-"{recipe.name}" уже добавлен!'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        model.objects.create(
-            user=user,
-            recipe=recipe
-        )
+        with transaction.atomic():
+            model.objects.create(
+                user=user,
+                recipe=recipe
+            )
         serializer = RecipesShortSerializer(recipe)
         return Response(
             serializer.data,
@@ -239,6 +486,59 @@ class RecipeViewSet(viewsets.ModelViewSet):
             status=status.HTTP_400_BAD_REQUEST
         )
 
+    def change_recipes_batch(self, request, model):
+        """Пакетное добавление/удаление рецептов по списку id."""
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        change = (
+            remove_recipes_from_list if request.method == 'DELETE'
+            else add_recipes_to_list
+        )
+        with transaction.atomic():
+            results = change(
+                model,
+                request.user,
+                serializer.validated_data['ids']
+            )
+        return Response({
+            'results': [
+                {'id': recipe_id, 'status': result}
+                for recipe_id, result in results.items()
+            ]
+        })
+
+    @action(
+        ['post'],
+        detail=False,
+        permission_classes=[IsAuthenticated],
+        url_path='favorite',
+        url_name='favorite_batch'
+    )
+    def favorite_batch(self, request):
+        """Пакетное добавление в избранное."""
+        return self.change_recipes_batch(request, Favorite)
+
+    @favorite_batch.mapping.delete
+    def delete_favorite_batch(self, request):
+        """Пакетное удаление из избранного."""
+        return self.change_recipes_batch(request, Favorite)
+
+    @action(
+        ['post'],
+        detail=False,
+        permission_classes=[IsAuthenticated],
+        url_path='shopping_cart',
+        url_name='shopping_cart_batch'
+    )
+    def shopping_cart_batch(self, request):
+        """Пакетное добавление в список покупок."""
+        return self.change_recipes_batch(request, ShoppingCart)
+
+    @shopping_cart_batch.mapping.delete
+    def delete_shopping_cart_batch(self, request):
+        """Пакетное удаление из списка покупок."""
+        return self.change_recipes_batch(request, ShoppingCart)
+
     @action(
         ['post'],
         detail=True,
@@ -287,45 +587,46 @@ class RecipeViewSet(viewsets.ModelViewSet):
             ShoppingCart
         )
 
-    @staticmethod
-    def shopping_cart_to_list(ingredients):
-        """Метод создания списка покупок."""
-        shopping_cart_list = ''
-        for ingredient in ingredients:
-            shopping_cart_list += (
-                f'{ingredient["ingredient__name"]}: '
-                f'{ingredient["sum"]} '
-                f'({ingredient["ingredient__measurement_unit"]})\n'
-            )
-        return shopping_cart_list
-
     @action(
         ['get'],
         detail=False,
         permission_classes=[IsAuthenticated],
+        renderer_classes=(PlainTextRenderer, CSVRenderer, JSONRenderer),
         url_path='download_shopping_cart',
         url_name='download_shopping_cart',
     )
     def download_shopping_cart(self, request):
-        """Метод загрузки списка покупок."""
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__shopping_cart__user=request.user
+        """Метод загрузки списка покупок.
+
+        Формат выбирается параметром `format` (txt, csv, json)
+        или заголовком Accept; по умолчанию - txt.
+        """
+        ingredients = ShoppingCartIngredient.objects.filter(
+            user=request.user
         ).values(
             'ingredient__name',
-            'ingredient__measurement_unit'
-        ).annotate(sum=Sum('amount'))
-        shopping_cart_list = self.shopping_cart_to_list(ingredients)
-        return HttpResponse(
-            shopping_cart_list,
-            content_type='text/plain'
+            'ingredient__measurement_unit',
+            sum=F('amount')
+        ).order_by('ingredient__name')
+        rows = ingredients.iterator()
+        if isinstance(request._request, ASGIRequest):
+            # Под ASGI Django 3.2 читает потоковый ответ в цикле событий,
+            # где ORM недоступен: строки загружаются здесь, в потоке.
+            rows = list(ingredients)
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            SHOPPING_CART_EXPORTERS[renderer.format](rows),
+            content_type=f'{renderer.media_type}; charset=utf-8'
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping_cart.{renderer.format}"'
         )
+        return response
 
     @action(detail=True, url_path='get-link')
     def get_link(self, request, pk=None):
         """Метод получения короткой ссылки."""
-        try:
-            get_object_or_404(Recipe, id=pk)
-        except Http404:
+        if not Recipe.objects.filter(id=pk).exists():
             return Response(
                 'Рецепт не найден',
                 status=status.HTTP_404_NOT_FOUND
@@ -334,11 +635,26 @@ class RecipeViewSet(viewsets.ModelViewSet):
             'URL_HOST',
             default='https://localhost'
         )
-        long_url = f'{host}/recipes/{pk}/'
-        short_link = shorten_url(
-            long_url,
-            is_permanent=True
-        )
         return Response(
-            {'short-link': f'{host}/s/{short_link}', }
+            {'short-link': f'{host}/s/{encode_recipe_id(pk)}', }
         )
+
+
+def short_link_redirect(request, code):
+    """Переход по короткой ссылке."""
+    url = resolve_short_link(code)
+    if url is None:
+        raise Http404('Ссылка не найдена')
+    return HttpResponsePermanentRedirect(url)
+
+
+class MetricsView(APIView):
+    """Служебные метрики процесса для администраторов."""
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response({
+            'recipe_list_cache': get_recipe_list_stats(),
+            'db_connections': get_connection_stats(),
+        })
@@ -1,2 +1,20 @@
 PAGE_SIZE = 6
 PAGE_SIZE_QUERY_PARAM = 'limit'
+CURSOR_QUERY_PARAM = 'cursor'
+MAX_IMAGE_SIZE = 10 * 1024 * 1024
+MAX_IMAGE_DIMENSION = 6000
+IMAGE_HEADER_SIZE = 64 * 1024
+SHORT_LINK_PREFIX = 'r'
+SHORT_LINK_CACHE_SIZE = 4096
+SLOW_SQL_MAX_LENGTH = 200
+TAGS_MODE_ANY = 'any'
+TAGS_MODE_ALL = 'all'
+FIELDS_QUERY_PARAM = 'fields'
+OMIT_QUERY_PARAM = 'omit'
+MAX_BATCH_SIZE = 100
+COMPRESSIBLE_CONTENT_TYPES = (
+    'application/json',
+    'text/',
+    'application/javascript',
+)
+BROTLI_QUALITY = 5
@@ -6,3 +6,4 @@ MIN_COOKING_TIME = 1
 MAX_COOKING_TIME = 1440
 MIN_AMOUNT = 1
 MAX_AMOUNT = 2000
+IMPORT_BATCH_SIZE = 1000
@@ -0,0 +1,69 @@
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+RENDITIONS = {
+    'thumb': {
+        'size': (320, 320), 'format': 'JPEG', 'suffix': 'thumb.jpg'
+    },
+    'medium': {
+        'size': (800, 800), 'format': 'JPEG', 'suffix': 'medium.jpg'
+    },
+    'webp': {
+        'size': (800, 800), 'format': 'WEBP', 'suffix': 'medium.webp'
+    },
+}
+RENDITION_QUALITY = 80
+
+
+def rendition_name(name, rendition):
+    """Имя файла производного изображения рядом с оригиналом."""
+    root, _ = os.path.splitext(name)
+    return f'{root}.{RENDITIONS[rendition]["suffix"]}'
+
+
+def make_renditions(field_file, overwrite=True):
+    """Создание уменьшенных копий изображения (миниатюра, средняя, WebP)."""
+    if not field_file:
+        return []
+    storage = field_file.storage
+    with field_file.open('rb') as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image.load()
+    created = []
+    for rendition, options in RENDITIONS.items():
+        name = rendition_name(field_file.name, rendition)
+        if storage.exists(name):
+            if not overwrite:
+                continue
+            storage.delete(name)
+        copy = image.copy()
+        copy.thumbnail(options['size'])
+        if options['format'] == 'JPEG' and copy.mode != 'RGB':
+            copy = copy.convert('RGB')
+        buffer = BytesIO()
+        copy.save(
+            buffer,
+            options['format'],
+            quality=RENDITION_QUALITY,
+            optimize=True
+        )
+        created.append(storage.save(name, ContentFile(buffer.getvalue())))
+    return created
+
+
+def delete_renditions(field_file):
+    if not field_file:
+        return
+    for rendition in RENDITIONS:
+        field_file.storage.delete(rendition_name(field_file.name, rendition))
+
+
+def rendition_url(field_file, rendition):
+    """URL производного изображения; оригинал, если копии ещё нет."""
+    name = rendition_name(field_file.name, rendition)
+    if field_file.storage.exists(name):
+        return field_file.storage.url(name)
+    return field_file.url
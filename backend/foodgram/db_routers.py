@@ -0,0 +1,34 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+
+use_replica = ContextVar('use_replica', default=False)
+
+PRIMARY_ONLY_MODELS = ('authtoken.token',)
+
+
+class ReplicaRouter:
+    """
+    Чтение с реплик для запросов, отмеченных ReplicaMiddleware.
+
+    Всё остальное — запись, запросы вне HTTP (команды, миграции)
+    и токены авторизации — идёт в default.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (
+            use_replica.get()
+            and model._meta.label_lower not in PRIMARY_ONLY_MODELS
+        ):
+            return random.choice(settings.DATABASE_REPLICAS)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
@@ -38,6 +38,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.CompressionMiddleware',
+    'api.middleware.SQLTimingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -89,6 +91,41 @@ else:
         }
     )
 
+CONN_MAX_AGE = int(os.getenv('CONN_MAX_AGE', 60))
+
+CONN_HEALTH_CHECKS = os.getenv(
+    'CONN_HEALTH_CHECKS', 'True'
+).lower() in ('1', 'true')
+
+CONN_HEALTH_CHECK_INTERVAL = int(os.getenv('CONN_HEALTH_CHECK_INTERVAL', 30))
+
+DATABASES['default']['CONN_MAX_AGE'] = CONN_MAX_AGE
+
+# Реплики: хосты PostgreSQL (host[:port]) или пути к файлам SQLite.
+# Чтение с реплик работает только с общим кэшем (CACHE_BACKEND), в котором
+# хранится отметка «читать свои записи» после изменяющего запроса.
+DATABASE_REPLICAS = []
+for index, location in enumerate(
+    filter(None, map(str.strip, os.getenv('DB_REPLICAS', '').split(',')))
+):
+    replica = dict(DATABASES['default'], TEST={'MIRROR': 'default'})
+    if 'POSTGRESQL' in os.environ:
+        host, _, port = location.partition(':')
+        replica.update(HOST=host, PORT=port or replica['PORT'])
+    else:
+        replica['NAME'] = location
+    DATABASES[f'replica_{index}'] = replica
+    DATABASE_REPLICAS.append(f'replica_{index}')
+
+if DATABASE_REPLICAS:
+    DATABASE_ROUTERS = ['foodgram.db_routers.ReplicaRouter']
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index('api.middleware.SQLTimingMiddleware') + 1,
+        'api.middleware.ReplicaMiddleware'
+    )
+
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 10))
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -124,6 +161,10 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+FILE_UPLOAD_MAX_MEMORY_SIZE = int(
+    os.getenv('FILE_UPLOAD_MAX_MEMORY_SIZE', 256 * 1024)
+)
+
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -136,11 +177,57 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
+    ],
+
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
     ],
 
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+INGREDIENT_SEARCH_LIMIT = int(os.getenv('INGREDIENT_SEARCH_LIMIT', 50))
+
+INGREDIENT_INDEX_TTL = int(os.getenv('INGREDIENT_INDEX_TTL', 60))
+
+RECIPE_LIST_CACHE_TIMEOUT = int(os.getenv('RECIPE_LIST_CACHE_TIMEOUT', 300))
+
+SQL_TIMING_SAMPLE_RATE = float(os.getenv('SQL_TIMING_SAMPLE_RATE', 0.1))
+
+AUTH_TOKEN_CACHE_TIMEOUT = int(os.getenv('AUTH_TOKEN_CACHE_TIMEOUT', 60))
+
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+
+ASYNC_API_VIEWS = os.getenv('ASYNC_API_VIEWS', '').lower() in ('1', 'true')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'api.sql': {
+            'handlers': ['console'],
+            'level': os.getenv('SQL_TIMING_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
     'HIDE_USERS': False,
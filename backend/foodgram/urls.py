@@ -1,9 +1,19 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import include, path
 
+from api import async_views, views
+
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls', namespace='api')),
-    path('s/', include('urlshortner.urls')),
+    path(
+        's/<str:code>',
+        (
+            async_views.short_link_redirect if settings.ASYNC_API_VIEWS
+            else views.short_link_redirect
+        ),
+        name='short-link'
+    ),
 ]
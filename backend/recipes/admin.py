@@ -60,9 +60,12 @@ class RecipeAdmin(admin.ModelAdmin):
     empty_value_display = 'Не задано'
     inlines = (RecipeIngredientInline,)
 
-    @admin.display(description="Добавлено в избранное")
+    @admin.display(
+        description="Добавлено в избранное",
+        ordering='favorites_count'
+    )
     def number_to_favorites(self, obj):
-        return Favorite.objects.filter(recipe=obj).count()
+        return obj.favorites_count
 
 
 @admin.register(Favorite)
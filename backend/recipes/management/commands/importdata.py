@@ -1,21 +1,102 @@
 import csv
+import json
+import os
+import time
+from itertools import islice
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 
+from core.constants_recipes import IMPORT_BATCH_SIZE
 from recipes.models import Ingredient
 
+CSV_HEADER = ('name', 'measurement_unit')
+
 
 class Command(BaseCommand):
     help = 'Импорт ингредиентов в БД.'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default='data/ingredients.csv',
+            help='Путь к файлу CSV или JSON.'
+        )
+        parser.add_argument(
+            '--format',
+            choices=('csv', 'json'),
+            help='Формат файла, по умолчанию определяется по расширению.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=IMPORT_BATCH_SIZE,
+            help='Количество строк в одной пачке.'
+        )
+
     def handle(self, *args, **options):
-        self.import_ingredients()
-
-    def import_ingredients(self):
-        with open('data/ingredients.csv', 'r', encoding='utf-8') as csv_file:
-            reader = csv.reader(csv_file)
-            next(reader)
-            Ingredient.objects.bulk_create(
-                Ingredient(name=row[0], measurement_unit=row[1])
-                for row in reader
-            )
+        path = options['path']
+        file_format = options['format'] or os.path.splitext(
+            path
+        )[1].lstrip('.').lower()
+        if file_format not in ('csv', 'json'):
+            raise CommandError(f'Неизвестный формат файла: {path}')
+        if options['batch_size'] < 1:
+            raise CommandError('Размер пачки должен быть больше нуля.')
+        started = time.monotonic()
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                rows = getattr(self, f'read_{file_format}')(file)
+                inserted, skipped = self.import_ingredients(
+                    rows, options['batch_size']
+                )
+        except OSError as error:
+            raise CommandError(error)
+        except (ValueError, KeyError, IndexError) as error:
+            raise CommandError(f'Некорректные данные в {path}: {error}')
+        elapsed = time.monotonic() - started
+        total = inserted + skipped
+        self.stdout.write(self.style.SUCCESS(
+            f'Добавлено: {inserted}, пропущено: {skipped}, '
+            f'{total / max(elapsed, 1e-6):.0f} строк/с ({elapsed:.2f} с).'
+        ))
+
+    def read_csv(self, file):
+        """Строки CSV; заголовок пропускается, только если он есть."""
+        for index, row in enumerate(csv.reader(file)):
+            if not row:
+                continue
+            if index == 0 and tuple(row[:2]) == CSV_HEADER:
+                continue
+            yield row[0], row[1]
+
+    def read_json(self, file):
+        for item in json.load(file):
+            yield item['name'], item['measurement_unit']
+
+    def import_ingredients(self, rows, batch_size):
+        """Пачками добавляет ингредиенты, которых ещё нет в БД."""
+        inserted = skipped = 0
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return inserted, skipped
+            pairs = {
+                (name.strip(), unit.strip()) for name, unit in batch
+            }
+            existing = set(Ingredient.objects.filter(
+                name__in={name for name, _ in pairs}
+            ).values_list('name', 'measurement_unit'))
+            new = pairs - existing
+            with transaction.atomic():
+                Ingredient.objects.bulk_create(
+                    [
+                        Ingredient(name=name, measurement_unit=unit)
+                        for name, unit in new
+                    ],
+                    ignore_conflicts=True
+                )
+            inserted += len(new)
+            skipped += len(batch) - len(new)
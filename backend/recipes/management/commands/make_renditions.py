@@ -0,0 +1,37 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from core.images import make_renditions
+from recipes.models import Recipe
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Создание уменьшенных копий изображений рецептов и аватаров.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Пересоздать уже существующие копии.'
+        )
+
+    def handle(self, *args, **options):
+        created = failed = 0
+        for model, field in ((Recipe, 'image'), (User, 'avatar')):
+            queryset = model.objects.exclude(
+                **{field: ''}
+            ).only(field).iterator()
+            for instance in queryset:
+                try:
+                    created += len(make_renditions(
+                        getattr(instance, field),
+                        overwrite=options['force']
+                    ))
+                except (OSError, ValueError) as error:
+                    failed += 1
+                    self.stderr.write(f'{instance.pk}: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано копий: {created}, ошибок: {failed}.'
+        ))
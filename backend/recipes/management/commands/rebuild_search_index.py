@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Перестройка индекса полнотекстового поиска рецептов.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS('Индекс поиска перестроен.'))
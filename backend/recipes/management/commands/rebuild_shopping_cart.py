@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.services import rebuild_shopping_cart_totals
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт сумм ингредиентов в списках покупок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            nargs='+',
+            dest='user_ids',
+            help='id пользователей; по умолчанию - все.'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            created = rebuild_shopping_cart_totals(options['user_ids'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Пересчитано строк: {created}.')
+        )
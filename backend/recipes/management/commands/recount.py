@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.services import recount_counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт счётчиков избранного, списков покупок и подписок.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            recipes, users = recount_counters()
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано рецептов: {recipes}, пользователей: {users}.'
+        ))
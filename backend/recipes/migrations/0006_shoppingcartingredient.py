@@ -0,0 +1,57 @@
+# Generated by Django 3.2.3 on 2026-10-18 02:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_shopping_cart_totals(apps, schema_editor):
+    ShoppingCart = apps.get_model('recipes', 'ShoppingCart')
+    ShoppingCartIngredient = apps.get_model(
+        'recipes',
+        'ShoppingCartIngredient'
+    )
+    rows = ShoppingCart.objects.filter(
+        recipe__recipe_recipeingredients__isnull=False
+    ).values(
+        'user_id',
+        ingredient_id=models.F('recipe__recipe_recipeingredients__ingredient')
+    ).annotate(
+        amount=models.Sum('recipe__recipe_recipeingredients__amount')
+    ).order_by()
+    ShoppingCartIngredient.objects.bulk_create(
+        (ShoppingCartIngredient(**row) for row in rows.iterator()),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0005_recipe_pub_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingCartIngredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.PositiveIntegerField(verbose_name='Количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_cart_ingredients', to='recipes.ingredient', verbose_name='Ингредиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_cart_ingredients', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Ингредиент списка покупок',
+                'verbose_name_plural': 'Ингредиенты списков покупок',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcartingredient',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='unique_shoppingcart_ingredient'),
+        ),
+        migrations.RunPython(
+            fill_shopping_cart_totals,
+            migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 3.2.3 on 2026-10-18 02:02
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(model, field):
+    return Coalesce(
+        models.Subquery(
+            model.objects.filter(
+                **{field: models.OuterRef('pk')}
+            ).order_by().values(field).annotate(
+                total=models.Count('pk')
+            ).values('total')
+        ),
+        0
+    )
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Favorite = apps.get_model('recipes', 'Favorite')
+    ShoppingCart = apps.get_model('recipes', 'ShoppingCart')
+    User = apps.get_model('users', 'User')
+    Subscription = apps.get_model('users', 'Subscription')
+    Recipe.objects.update(
+        favorites_count=count_subquery(Favorite, 'recipe'),
+        shopping_cart_count=count_subquery(ShoppingCart, 'recipe')
+    )
+    User.objects.update(
+        recipes_count=count_subquery(Recipe, 'author'),
+        subscribers_count=count_subquery(Subscription, 'author')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_shoppingcartingredient'),
+        ('users', '0009_user_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Добавлено в избранное'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='shopping_cart_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Добавлено в списки покупок'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
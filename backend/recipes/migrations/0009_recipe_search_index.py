@@ -0,0 +1,54 @@
+# Generated by Django 3.2.3 on 2026-10-18 02:13
+
+from django.db import migrations
+
+POSTGRES_VECTOR = (
+    "setweight(to_tsvector('russian', name), 'A') || "
+    "setweight(to_tsvector('russian', text), 'B')"
+)
+
+FORWARD_SQL = {
+    'postgresql': (
+        'ALTER TABLE recipes_recipe ADD COLUMN search_vector tsvector',
+        f'UPDATE recipes_recipe SET search_vector = {POSTGRES_VECTOR}',
+        'CREATE INDEX recipe_search_vector_idx ON recipes_recipe '
+        'USING GIN (search_vector)',
+    ),
+    'sqlite': (
+        'CREATE VIRTUAL TABLE recipes_recipe_fts USING fts5('
+        "name, text, tokenize='unicode61 remove_diacritics 2')",
+        'INSERT INTO recipes_recipe_fts (rowid, name, text) '
+        'SELECT id, name, text FROM recipes_recipe',
+    ),
+}
+
+BACKWARD_SQL = {
+    'postgresql': (
+        'DROP INDEX IF EXISTS recipe_search_vector_idx',
+        'ALTER TABLE recipes_recipe DROP COLUMN IF EXISTS search_vector',
+    ),
+    'sqlite': (
+        'DROP TABLE IF EXISTS recipes_recipe_fts',
+    ),
+}
+
+
+def run_vendor_sql(statements):
+    def run(apps, schema_editor):
+        for sql in statements.get(schema_editor.connection.vendor, ()):
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_vendor_sql(FORWARD_SQL),
+            run_vendor_sql(BACKWARD_SQL)
+        ),
+    ]
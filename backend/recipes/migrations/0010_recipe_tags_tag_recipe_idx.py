@@ -0,0 +1,18 @@
+# Generated by Django 3.2.3 on 2026-10-18 02:14
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipe_search_index'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX recipe_tags_tag_recipe_idx '
+            'ON recipes_recipe_tags (tag_id, recipe_id)',
+            'DROP INDEX recipe_tags_tag_recipe_idx'
+        ),
+    ]
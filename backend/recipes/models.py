@@ -27,6 +27,10 @@ class Ingredient(models.Model):
         max_length=MAX_LENGHT_MEASUREMENT_LENGTH,
         help_text='Выберите единицу измерения'
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения',
+    )
 
     class Meta:
         verbose_name = 'Ингредиент'
@@ -60,6 +64,10 @@ class Tag(models.Model):
             'разрешены символы латиницы, цифры, дефис и подчёркивание.'
         )
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения',
+    )
 
     class Meta:
         verbose_name = 'Тег'
@@ -118,11 +126,31 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации',
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения',
+    )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='Добавлено в избранное',
+        default=0,
+        editable=False
+    )
+    shopping_cart_count = models.PositiveIntegerField(
+        verbose_name='Добавлено в списки покупок',
+        default=0,
+        editable=False
+    )
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
-        ordering = ('-pub_date',)
+        ordering = ('-pub_date', '-id')
+        indexes = (
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='recipe_pub_date_id_idx'
+            ),
+        )
 
     def __str__(self):
         return self.name
@@ -209,3 +237,33 @@ class ShoppingCart(BaseForSubscriptionSystemModel):
                 name='unique_shoppingcart'
             ),
         )
+
+
+class ShoppingCartIngredient(models.Model):
+    """Модель суммарного количества ингредиентов в списке покупок."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_cart_ingredients',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_cart_ingredients',
+        verbose_name='Ингредиент'
+    )
+    amount = models.PositiveIntegerField(
+        verbose_name='Количество'
+    )
+
+    class Meta:
+        verbose_name = 'Ингредиент списка покупок'
+        verbose_name_plural = 'Ингредиенты списков покупок'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_shoppingcart_ingredient'
+            ),
+        )
@@ -0,0 +1,109 @@
+"""Полнотекстовый поиск рецептов по названию и описанию.
+
+PostgreSQL: колонка search_vector (tsvector, русская морфология)
+с GIN-индексом. SQLite: таблица FTS5 recipes_recipe_fts, rowid
+которой совпадает с id рецепта. Обе создаются миграцией 0009, модель
+о них не знает. На остальных СУБД поиск идёт через icontains.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q, Value
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'recipes_recipe_fts'
+WORD_RE = re.compile(r'\w+')
+
+POSTGRES_VECTOR = (
+    "setweight(to_tsvector('russian', name), 'A') || "
+    "setweight(to_tsvector('russian', text), 'B')"
+)
+
+
+def get_fts_query(query):
+    """Запрос FTS5 из слов query: все слова по префиксу."""
+    return ' '.join(f'"{word}"*' for word in WORD_RE.findall(query))
+
+
+def search_recipes(queryset, query):
+    """Рецепты, подходящие под query, по убыванию релевантности."""
+    ordering = ('-search_rank', *queryset.model._meta.ordering)
+    if connection.vendor == 'postgresql':
+        tsquery = "plainto_tsquery('russian', %s)"
+        return queryset.filter(id__in=RawSQL(
+            'SELECT id FROM recipes_recipe '
+            f'WHERE search_vector @@ {tsquery}',
+            (query,)
+        )).annotate(search_rank=RawSQL(
+            f'ts_rank(recipes_recipe.search_vector, {tsquery})', (query,)
+        )).order_by(*ordering)
+    if connection.vendor == 'sqlite':
+        fts_query = get_fts_query(query)
+        if not fts_query:
+            return queryset.none()
+        return queryset.filter(id__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            (fts_query,)
+        )).annotate(search_rank=RawSQL(
+            f'(SELECT -bm25({FTS_TABLE}, 2.0, 1.0) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s '
+            f'AND {FTS_TABLE}.rowid = recipes_recipe.id)',
+            (fts_query,)
+        )).order_by(*ordering)
+    return queryset.filter(
+        Q(name__icontains=query) | Q(text__icontains=query)
+    ).annotate(search_rank=Value(0)).order_by(*ordering)
+
+
+def update_search_index(recipe_ids):
+    """Обновление записей индекса для рецептов recipe_ids."""
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(recipe_ids))
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                f'UPDATE recipes_recipe SET search_vector = {POSTGRES_VECTOR} '
+                f'WHERE id IN ({placeholders})',
+                recipe_ids
+            )
+        elif connection.vendor == 'sqlite':
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})',
+                recipe_ids
+            )
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, text) '
+                'SELECT id, name, text FROM recipes_recipe '
+                f'WHERE id IN ({placeholders})',
+                recipe_ids
+            )
+
+
+def delete_search_index(recipe_ids):
+    """Удаление записей FTS5 (в PostgreSQL вектор удаляется со строкой)."""
+    recipe_ids = list(recipe_ids)
+    if connection.vendor != 'sqlite' or not recipe_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(recipe_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})',
+            recipe_ids
+        )
+
+
+def rebuild_search_index():
+    """Полная перестройка индекса поиска."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                f'UPDATE recipes_recipe SET search_vector = {POSTGRES_VECTOR}'
+            )
+        elif connection.vendor == 'sqlite':
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, text) '
+                'SELECT id, name, text FROM recipes_recipe'
+            )
@@ -0,0 +1,280 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum, Window
+from django.db.models.functions import Coalesce, Greatest, RowNumber
+
+from recipes.models import (
+    Favorite,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    ShoppingCartIngredient
+)
+from users.models import Subscription, User
+
+RECIPE_COUNTER_FIELDS = {
+    Favorite: 'favorites_count',
+    ShoppingCart: 'shopping_cart_count',
+}
+
+
+def counter_value(field, delta):
+    """Новое значение счётчика; не опускается ниже нуля.
+
+    Строки, созданные в обход API (админка, фикстуры), могли не учесть
+    счётчик, и уменьшение не должно нарушать ограничение >= 0.
+    """
+    return Greatest(F(field) + delta, 0)
+
+
+def change_counter(model, pk, field, delta=1):
+    """Атомарное изменение счётчика field у объекта model."""
+    model.objects.filter(pk=pk).update(**{field: counter_value(field, delta)})
+
+
+def count_subquery(model, field):
+    """Подзапрос количества строк model, ссылающихся на внешний объект."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(
+                **{field: OuterRef('pk')}
+            ).order_by().values(field).annotate(
+                total=Count('pk')
+            ).values('total')
+        ),
+        0
+    )
+
+
+def recount_counters():
+    """Пересчёт денормализованных счётчиков рецептов и пользователей."""
+    return (
+        Recipe.objects.update(
+            favorites_count=count_subquery(Favorite, 'recipe'),
+            shopping_cart_count=count_subquery(ShoppingCart, 'recipe')
+        ),
+        User.objects.update(
+            recipes_count=count_subquery(Recipe, 'author'),
+            subscribers_count=count_subquery(Subscription, 'author')
+        )
+    )
+
+
+def apply_shopping_cart_deltas(deltas):
+    """Изменение сумм ингредиентов в списках покупок.
+
+    deltas - словарь {(user_id, ingredient_id): изменение количества}.
+    Строки пользователей блокируются до чтения сумм, поэтому
+    параллельные изменения одного списка выполняются по очереди.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    with transaction.atomic():
+        lock_users({user_id for user_id, _ in deltas})
+        _apply_shopping_cart_deltas(deltas)
+
+
+def lock_users(user_ids):
+    """Блокировка строк пользователей до конца транзакции."""
+    list(User.objects.select_for_update().filter(
+        id__in=user_ids
+    ).order_by('id').values_list('id', flat=True))
+
+
+def _apply_shopping_cart_deltas(deltas):
+    rows = {
+        (row.user_id, row.ingredient_id): row
+        for row in ShoppingCartIngredient.objects.select_for_update().filter(
+            user_id__in={user_id for user_id, _ in deltas},
+            ingredient_id__in={ingredient_id for _, ingredient_id in deltas}
+        )
+    }
+    to_create, to_update, to_delete = [], [], []
+    for (user_id, ingredient_id), delta in deltas.items():
+        row = rows.get((user_id, ingredient_id))
+        if row is None:
+            if delta > 0:
+                to_create.append(ShoppingCartIngredient(
+                    user_id=user_id,
+                    ingredient_id=ingredient_id,
+                    amount=delta
+                ))
+            continue
+        row.amount += delta
+        if row.amount > 0:
+            to_update.append(row)
+        else:
+            to_delete.append(row.id)
+    ShoppingCartIngredient.objects.bulk_create(to_create)
+    ShoppingCartIngredient.objects.bulk_update(to_update, ('amount',))
+    if to_delete:
+        ShoppingCartIngredient.objects.filter(id__in=to_delete).delete()
+
+
+def change_shopping_cart_totals(user_id, recipe_ids, sign=1):
+    """Добавление (sign=1) или вычитание (sign=-1) рецептов из сумм."""
+    deltas = defaultdict(int)
+    for ingredient_id, amount in RecipeIngredient.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('ingredient_id', 'amount'):
+        deltas[(user_id, ingredient_id)] += sign * amount
+    apply_shopping_cart_deltas(deltas)
+
+
+def add_recipes_to_list(model, user, recipe_ids):
+    """Добавление рецептов в избранное/список покупок одним INSERT.
+
+    Возвращает {recipe_id: статус}: created, exists или not_found.
+    Вызывается внутри транзакции; строка пользователя блокируется,
+    чтобы параллельные запросы не посчитали одни рецепты дважды.
+    """
+    lock_users((user.id,))
+    found = set(Recipe.objects.filter(
+        id__in=recipe_ids
+    ).values_list('id', flat=True))
+    existing = set(model.objects.filter(
+        user=user,
+        recipe_id__in=found
+    ).values_list('recipe_id', flat=True))
+    created = found - existing
+    if created:
+        model.objects.bulk_create(
+            [model(user=user, recipe_id=recipe_id) for recipe_id in created],
+            ignore_conflicts=True
+        )
+        change_list_counters(model, created, 1)
+        if model is ShoppingCart:
+            change_shopping_cart_totals(user.id, created)
+    return {
+        recipe_id: (
+            'created' if recipe_id in created
+            else 'exists' if recipe_id in existing
+            else 'not_found'
+        )
+        for recipe_id in recipe_ids
+    }
+
+
+def remove_recipes_from_list(model, user, recipe_ids):
+    """Удаление рецептов из избранного/списка покупок.
+
+    Возвращает {recipe_id: статус}: deleted или not_found.
+    Счётчики рецептов и суммы списка покупок обновляют сигналы
+    post_delete.
+    Вызывается внутри транзакции; строка пользователя блокируется.
+    """
+    lock_users((user.id,))
+    rows = model.objects.filter(user=user, recipe_id__in=recipe_ids)
+    deleted = set(rows.values_list('recipe_id', flat=True))
+    if deleted:
+        rows.delete()
+    return {
+        recipe_id: 'deleted' if recipe_id in deleted else 'not_found'
+        for recipe_id in recipe_ids
+    }
+
+
+def change_list_counters(model, recipe_ids, sign):
+    """Счётчики рецептов после bulk_create в избранное/список покупок.
+
+    bulk_create не отправляет сигналы, поэтому счётчики меняются явно.
+    """
+    field = RECIPE_COUNTER_FIELDS[model]
+    Recipe.objects.filter(id__in=recipe_ids).update(
+        **{field: counter_value(field, sign)}
+    )
+
+
+def change_recipe_in_shopping_carts(recipe_id, old_amounts, new_amounts):
+    """Пересчёт сумм у всех, чей список покупок содержит рецепт.
+
+    old_amounts и new_amounts - словари {ingredient_id: amount}
+    до и после изменения ингредиентов рецепта.
+    """
+    ingredient_deltas = {
+        ingredient_id: (
+            new_amounts.get(ingredient_id, 0)
+            - old_amounts.get(ingredient_id, 0)
+        )
+        for ingredient_id in {*old_amounts, *new_amounts}
+    }
+    if not any(ingredient_deltas.values()):
+        return
+    apply_shopping_cart_deltas({
+        (user_id, ingredient_id): delta
+        for user_id in ShoppingCart.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('user_id', flat=True)
+        for ingredient_id, delta in ingredient_deltas.items()
+    })
+
+
+def get_recipe_amounts(recipe):
+    """Ингредиенты рецепта в виде {ingredient_id: amount}."""
+    return dict(
+        recipe.recipe_recipeingredients.values_list('ingredient_id', 'amount')
+    )
+
+
+def rebuild_shopping_cart_totals(user_ids=None):
+    """Полный пересчёт сумм ингредиентов списков покупок."""
+    totals = ShoppingCartIngredient.objects.all()
+    carts = ShoppingCart.objects.all()
+    if user_ids is not None:
+        totals = totals.filter(user_id__in=user_ids)
+        carts = carts.filter(user_id__in=user_ids)
+    totals.delete()
+    rows = carts.filter(
+        recipe__recipe_recipeingredients__isnull=False
+    ).values(
+        'user_id',
+        ingredient_id=F('recipe__recipe_recipeingredients__ingredient')
+    ).annotate(
+        amount=Sum('recipe__recipe_recipeingredients__amount')
+    ).order_by()
+    return len(ShoppingCartIngredient.objects.bulk_create(
+        (ShoppingCartIngredient(**row) for row in rows.iterator()),
+        batch_size=1000
+    ))
+
+
+def get_latest_recipes_by_author(author_ids, limit=None):
+    """Последние рецепты авторов одним запросом: {author_id: [Recipe]}.
+
+    Ограничение limit на автора применяется в SQL через
+    ROW_NUMBER() OVER (PARTITION BY author_id). Django 3.2 не умеет
+    фильтровать по оконной функции, поэтому запрос оборачивается
+    в подзапрос.
+    """
+    author_ids = list(author_ids)
+    if not author_ids:
+        return {}
+    queryset = Recipe.objects.filter(author_id__in=author_ids).only(
+        'id',
+        'name',
+        'image',
+        'cooking_time',
+        'pub_date',
+        'author_id'
+    ).annotate(
+        recipe_rank=Window(
+            RowNumber(),
+            partition_by=F('author_id'),
+            order_by=(F('pub_date').desc(), F('id').desc())
+        )
+    ).order_by()
+    sql, params = queryset.query.get_compiler(using=queryset.db).as_sql()
+    condition = ''
+    if limit is not None:
+        condition = 'WHERE ranked.recipe_rank <= %s'
+        params = (*params, limit)
+    recipes = defaultdict(list)
+    for recipe in Recipe.objects.db_manager(queryset.db).raw(
+        f'SELECT * FROM ({sql}) ranked {condition} '
+        'ORDER BY ranked.recipe_rank',
+        params
+    ):
+        recipes[recipe.author_id].append(recipe)
+    return recipes
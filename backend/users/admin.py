@@ -15,6 +15,8 @@ class UserAdmin(BaseUserAdmin):
         'first_name',
         'last_name',
         'avatar',
+        'recipes_count',
+        'subscribers_count',
     )
     search_fields = (
         'username',
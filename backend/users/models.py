@@ -45,6 +45,16 @@ class User(AbstractUser):
         choices=ROLES,
         default=USER
     )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Количество рецептов',
+        default=0,
+        editable=False
+    )
+    subscribers_count = models.PositiveIntegerField(
+        verbose_name='Количество подписчиков',
+        default=0,
+        editable=False
+    )
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = (